@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.cache import get_auth_version, user_cache
+
+User = get_user_model()
+
+ROLE_CLAIM = 'role'
+AUTH_VERSION_CLAIM = 'auth_version'
+CLAIMS = (ROLE_CLAIM, 'is_superuser', 'is_active', AUTH_VERSION_CLAIM)
+
+
+def get_access_token(user):
+    """Access-токен с данными, которых хватает для проверки прав."""
+    token = AccessToken.for_user(user)
+    token['username'] = user.username
+    token[ROLE_CLAIM] = user.role
+    token['is_superuser'] = user.is_superuser
+    token['is_active'] = user.is_active
+    token[AUTH_VERSION_CLAIM] = user.auth_version
+    return token
+
+
+class ClaimsUser(TokenUser):
+    """Пользователь, собранный из клеймов токена без запроса к базе.
+
+    Клеймам можно верить, пока версия прав в токене совпадает
+    с текущей: это проверяет StatelessJWTAuthentication.
+    """
+
+    @cached_property
+    def role(self):
+        return self.token[ROLE_CLAIM]
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('is_active', False)
+
+    @property
+    def is_admin(self):
+        return self.role == User.ADMIN or self.is_superuser
+
+    @property
+    def is_moderator(self):
+        return self.role == User.MODERATOR
+
+    @property
+    def is_user(self):
+        return self.role == User.USER
+
+    @cached_property
+    def instance(self):
+        """Полный профиль пользователя из базы."""
+        try:
+            return User.objects.get(pk=self.id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed(
+                'Пользователь не найден.', code='user_not_found'
+            )
+
+
+def get_full_user(user):
+    """Модель пользователя там, где нужен весь профиль."""
+    if isinstance(user, ClaimsUser):
+        return user.instance
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация с кэшем пользователей в памяти процесса."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                'Токен не содержит идентификатора пользователя.'
+            )
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        elif not user.is_active:
+            raise AuthenticationFailed(
+                'Пользователь заблокирован.', code='user_inactive'
+            )
+        return user
+
+
+class StatelessJWTAuthentication(CachedJWTAuthentication):
+    """JWT-аутентификация без запроса пользователя на каждый запрос.
+
+    Права берутся из клеймов токена все время его жизни. Смена роли,
+    блокировка или удаление пользователя увеличивают его auth_version,
+    и новая версия сразу попадает в общий кэш. Токен со старой версией
+    или без клеймов проверяется по базе через кэш пользователей, как
+    в CachedJWTAuthentication. Версия читается из кэша
+    AUTH_VERSION_CACHE, который должен быть общим для всех процессов.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in CLAIMS):
+            return super().get_user(validated_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if get_auth_version(user_id) != validated_token[AUTH_VERSION_CLAIM]:
+            return super().get_user(validated_token)
+        if not validated_token['is_active']:
+            raise AuthenticationFailed(
+                'Пользователь заблокирован.', code='user_inactive'
+            )
+        return ClaimsUser(validated_token)
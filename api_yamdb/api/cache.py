@@ -0,0 +1,33 @@
+import hashlib
+from urllib.parse import urlencode
+
+from reviews.versions import get_version
+
+LIST_CACHE_TIMEOUT = 60 * 15
+
+
+def normalized_query(request):
+    return urlencode(sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    ))
+
+
+def request_digest(request, *parts):
+    """Хэш адреса запроса с нормализованной строкой параметров."""
+    raw = ':'.join((
+        request.get_host(),
+        request.path,
+        normalized_query(request),
+        *(str(part) for part in parts),
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def list_cache_key(model, request):
+    """Ключ кэша списка по версии таблицы и строке запроса."""
+    version = get_version(model)
+    return f'list:{model._meta.label_lower}:{version}:' + request_digest(
+        request
+    )
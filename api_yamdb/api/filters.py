@@ -1,15 +1,52 @@
 from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
 
 from reviews.models import Title
+from reviews.search import search_backend
 
 
-class TitleFilter(filters.FilterSet):
-    """Фильтры произведений."""
+class StableOrderingFilter(filters.OrderingFilter):
+    """Сортировка с id последним ключом.
+
+    Без него произведения с одинаковым значением поля могут
+    переставляться между страницами при пагинации.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        return qs.order_by(*ordering, 'id')
+
+
+class TitleGroupFilter(filters.FilterSet):
+    """Фильтры произведений по жанру и категории."""
     genre = filters.CharFilter(field_name='genre__slug')
     category = filters.CharFilter(field_name='category__slug')
+
+    class Meta:
+        model = Title
+        fields = ('genre', 'category')
+
+
+class TitleFilter(TitleGroupFilter):
+    """Фильтры произведений."""
     name = filters.CharFilter(field_name='name', lookup_expr='icontains')
     year = filters.NumberFilter(field_name='year')
+    # Полнотекстовый поиск по названию и описанию. Результаты идут
+    # по релевантности, если не задан ordering.
+    search = filters.CharFilter(method='filter_search')
+    # ordering=-rating сортирует по взвешенному рейтингу: у него
+    # есть индекс, а у произведений с парой отзывов он не завышен.
+    ordering = StableOrderingFilter(fields=(
+        ('weighted_rating', 'rating'),
+        ('year', 'year'),
+        ('name', 'name'),
+    ))
 
     class Meta:
         model = Title
         fields = ('genre', 'category', 'name', 'year')
+
+    def filter_search(self, queryset, name, value):
+        return search_backend().search(queryset, value)
@@ -0,0 +1,275 @@
+import json
+import math
+import random
+import time
+from collections import defaultdict
+
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db.models import Max, Min
+from django.test import Client
+
+from api.authentication import get_access_token
+from reviews.models import Comment, Review, Title, User
+from reviews.synthetic import BATCH_SIZE
+
+# Сколько произведений, отзывов и пользователей выбирается заранее
+# для построения запросов.
+SAMPLE_SIZE = 100
+PERCENTILES = (50, 90, 95, 99)
+SIZES = (
+    ('users', 100_000),
+    ('categories', 20),
+    ('genres', 50),
+    ('titles', 100_000),
+    ('reviews', 5_000_000),
+    ('comments', 20_000_000),
+)
+
+
+def sample_rows(queryset, fields, count, rng):
+    """Случайные строки таблицы без ORDER BY RANDOM().
+
+    Берется первая строка с id не меньше случайного значения
+    из диапазона id, поэтому каждая выборка — один запрос по индексу.
+    """
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    rows = []
+    for _ in range(count):
+        pk = rng.randint(bounds['low'], bounds['high'])
+        row = (
+            queryset.filter(pk__gte=pk).order_by('pk').values(*fields).first()
+        )
+        rows.append(row)
+    return rows
+
+
+def percentile(values, rank):
+    """Перцентиль по методу ближайшего ранга; values отсортированы."""
+    index = max(math.ceil(rank / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def summarize(latencies, errors):
+    """Сводка по одному эндпоинту; время в миллисекундах."""
+    values = sorted(latencies)
+    total = sum(values)
+    summary = {
+        'count': len(values),
+        'errors': errors,
+        'throughput': round(len(values) / total, 1) if total else None,
+        'mean': round(total / len(values) * 1000, 3),
+        'max': round(values[-1] * 1000, 3),
+    }
+    for rank in PERCENTILES:
+        summary[f'p{rank}'] = round(percentile(values, rank) * 1000, 3)
+    return summary
+
+
+class Scenarios:
+    """Набор запросов к API, близкий к реальной нагрузке.
+
+    Каждый сценарий возвращает ответ тестового клиента; вес сценария
+    задает его долю в общем потоке запросов.
+    """
+
+    def __init__(self, client, rng):
+        self.client = client
+        self.rng = rng
+        self.titles = sample_rows(
+            Title.objects.filter(review_count__gt=0), ('id',),
+            SAMPLE_SIZE, rng,
+        ) or sample_rows(Title.objects.all(), ('id',), SAMPLE_SIZE, rng)
+        if not self.titles:
+            raise CommandError(
+                'В базе нет произведений: запустите команду с --generate.'
+            )
+        self.title_count = Title.objects.count()
+        self.reviews = sample_rows(
+            Review.objects.all(), ('id', 'title_id'), SAMPLE_SIZE, rng
+        )
+        self.comments = sample_rows(
+            Comment.objects.all(), ('review_id', 'review__title_id'),
+            SAMPLE_SIZE, rng,
+        )
+        self.users = [
+            User.objects.get(pk=row['id'])
+            for row in sample_rows(User.objects.all(), ('id',), 10, rng)
+        ]
+        self.tokens = [get_access_token(user) for user in self.users]
+
+    def weights(self):
+        weights = {
+            'titles-list': 30,
+            'titles-detail': 15,
+            'categories-list': 3,
+            'genres-list': 3,
+        }
+        if self.users:
+            weights.update({'auth-token': 2, 'users-me': 5})
+        if self.reviews:
+            weights.update({'reviews-list': 20, 'reviews-detail': 7})
+        if self.comments:
+            weights['comments-list'] = 15
+        return weights
+
+    def get(self, url):
+        """GET от имени одного из выбранных пользователей."""
+        if not self.tokens:
+            return self.client.get(url)
+        token = self.rng.choice(self.tokens)
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def titles_list(self):
+        offset = self.rng.randrange(min(self.title_count, 1000))
+        return self.client.get(
+            '/api/v1/titles/', {'limit': 10, 'offset': offset}
+        )
+
+    def titles_detail(self):
+        title = self.rng.choice(self.titles)
+        return self.client.get(f'/api/v1/titles/{title["id"]}/')
+
+    def categories_list(self):
+        return self.client.get('/api/v1/categories/')
+
+    def genres_list(self):
+        return self.client.get('/api/v1/genres/')
+
+    def reviews_list(self):
+        title = self.rng.choice(self.titles)
+        return self.get(f'/api/v1/titles/{title["id"]}/reviews/')
+
+    def reviews_detail(self):
+        review = self.rng.choice(self.reviews)
+        return self.get(
+            f'/api/v1/titles/{review["title_id"]}/reviews/{review["id"]}/'
+        )
+
+    def comments_list(self):
+        comment = self.rng.choice(self.comments)
+        return self.get(
+            f'/api/v1/titles/{comment["review__title_id"]}/reviews/'
+            f'{comment["review_id"]}/comments/'
+        )
+
+    def auth_token(self):
+        user = self.rng.choice(self.users)
+        return self.client.post('/api/v1/auth/token/', {
+            'username': user.username,
+            'confirmation_code': default_token_generator.make_token(user),
+        })
+
+    def users_me(self):
+        return self.get('/api/v1/users/me/')
+
+    def run(self, name):
+        return getattr(self, name.replace('-', '_'))()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержки и пропускную способность эндпоинтов API '
+        'на синтетическом наборе данных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--generate',
+            action='store_true',
+            help='Перед замером сгенерировать синтетический набор данных.',
+        )
+        for name, default in SIZES:
+            parser.add_argument(
+                f'--{name}',
+                type=int,
+                default=default,
+                help=f'Сколько строк {name} сгенерировать с --generate.',
+            )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество строк в одной пачке INSERT.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='Количество замеряемых запросов.',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=100,
+            help='Количество запросов для прогрева, не входящих в замер.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Начальное значение генератора случайных чисел.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для JSON-отчета; по умолчанию отчет пишется в stdout.',
+        )
+
+    def generate(self, options):
+        call_command(
+            'generate_data',
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            stdout=self.stderr,
+            **{name: options[name] for name, _ in SIZES},
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должен быть больше нуля.')
+        if options['generate']:
+            self.generate(options)
+        rng = random.Random(options['seed'])
+        scenarios = Scenarios(Client(), rng)
+        weights = scenarios.weights()
+        names = rng.choices(
+            list(weights), list(weights.values()),
+            k=options['warmup'] + options['requests'],
+        )
+        for name in names[:options['warmup']]:
+            scenarios.run(name)
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        started = time.perf_counter()
+        for name in names[options['warmup']:]:
+            request_started = time.perf_counter()
+            response = scenarios.run(name)
+            latencies[name].append(time.perf_counter() - request_started)
+            if response.status_code >= 400:
+                errors[name] += 1
+        duration = time.perf_counter() - started
+
+        report = {
+            'seed': options['seed'],
+            'dataset': {
+                model.__name__: model.objects.count()
+                for model in (User, Title, Review, Comment)
+            },
+            'requests': options['requests'],
+            'duration': round(duration, 3),
+            'throughput': round(options['requests'] / duration, 1),
+            'endpoints': {
+                name: summarize(latencies[name], errors[name])
+                for name in sorted(latencies)
+            },
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2,
+                            sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
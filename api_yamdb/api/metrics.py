@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import defaultdict
+
+
+class RequestMetrics:
+    """Счетчики одного запроса: запросы к БД и время этапов в секундах.
+
+    app_time — время представления без запросов к БД: код
+    представления, проверки прав и сериализация вместе.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.app_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+        self._view_started = None
+
+    def start_view(self):
+        self._view_started = (time.perf_counter(), self.db_time)
+
+    def finish_view(self):
+        """Конец представления: возвращает момент начала рендеринга."""
+        finished = time.perf_counter()
+        if self._view_started is not None:
+            started, db_time = self._view_started
+            self.app_time = max(
+                finished - started - (self.db_time - db_time), 0.0
+            )
+        return finished
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обертка execute_wrapper для подсчета запросов."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self):
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'app;dur={self.app_time * 1000:.1f}',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+
+class MetricsReport:
+    """Сводка метрик по эндпоинтам (метод и имя представления)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = defaultdict(lambda: {
+            'requests': 0,
+            'queries': 0,
+            'max_queries': 0,
+            'db_time': 0.0,
+            'app_time': 0.0,
+            'render_time': 0.0,
+            'total_time': 0.0,
+        })
+
+    def add(self, endpoint, metrics):
+        with self._lock:
+            stats = self._views[endpoint]
+            stats['requests'] += 1
+            stats['queries'] += metrics.queries
+            stats['max_queries'] = max(stats['max_queries'], metrics.queries)
+            stats['db_time'] += metrics.db_time
+            stats['app_time'] += metrics.app_time
+            stats['render_time'] += metrics.render_time
+            stats['total_time'] += metrics.total_time
+
+    def as_dict(self):
+        """Средние значения по каждому представлению, время в мс."""
+        with self._lock:
+            report = {}
+            for endpoint, stats in self._views.items():
+                requests = stats['requests']
+                report[endpoint] = {
+                    'requests': requests,
+                    'max_queries': stats['max_queries'],
+                    'avg_queries': stats['queries'] / requests,
+                    **{
+                        f'avg_{key}_ms': stats[key] * 1000 / requests
+                        for key in (
+                            'db_time', 'app_time',
+                            'render_time', 'total_time',
+                        )
+                    },
+                }
+            return report
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+metrics_report = MetricsReport()
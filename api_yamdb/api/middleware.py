@@ -0,0 +1,83 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import RequestMetrics, metrics_report
+
+logger = logging.getLogger(__name__)
+
+
+def query_budget(method, view_name):
+    """Бюджет запросов представления для метода.
+
+    Ключ «МЕТОД имя» задает бюджет одного метода, ключ без метода —
+    бюджет чтения (GET и HEAD). Остальное — DEFAULT_QUERY_BUDGET.
+    """
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    budget = budgets.get(f'{method} {view_name}')
+    if budget is None and method in ('GET', 'HEAD'):
+        budget = budgets.get(view_name)
+    if budget is None:
+        budget = getattr(settings, 'DEFAULT_QUERY_BUDGET', None)
+    return budget
+
+
+class QueryMetricsMiddleware:
+    """Метрики запросов к БД и времени этапов для каждого представления.
+
+    Добавляет заголовок Server-Timing (при DEBUG или для администратора),
+    копит сводку в metrics_report и пишет предупреждение, если
+    представление превысило бюджет запросов из QUERY_BUDGETS.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_METRICS_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        request.query_metrics = metrics
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        finished = time.perf_counter()
+        metrics.total_time = finished - started
+        render_started = getattr(request, '_render_started', None)
+        if render_started is not None:
+            metrics.render_time = finished - render_started
+        if settings.DEBUG or getattr(
+            getattr(request, 'user', None), 'is_admin', False
+        ):
+            # Заголовок раскрывает устройство сервиса, поэтому в боевом
+            # режиме он только для администраторов.
+            response['Server-Timing'] = metrics.server_timing()
+
+        match = request.resolver_match
+        if match is not None:
+            self.record(request.method, match.view_name, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_metrics.start_view()
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся сразу после этого хука, а сериализация
+        # уже прошла в представлении.
+        request._render_started = request.query_metrics.finish_view()
+        return response
+
+    def record(self, method, view_name, metrics):
+        metrics_report.add(f'{method} {view_name}', metrics)
+        budget = query_budget(method, view_name)
+        if budget is not None and metrics.queries > budget:
+            logger.warning(
+                '%s %s: %d запросов к БД при бюджете %d.',
+                method, view_name, metrics.queries, budget,
+            )
@@ -1,4 +1,16 @@
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from reviews.stats import STATS_MODELS, count_stats
+from reviews.versions import get_versions
+
+from .cache import LIST_CACHE_TIMEOUT, list_cache_key, request_digest
+from .pagination import PubDateCursorPagination
+from .serializers import GroupStatsSerializer
 
 
 class ListCreateDestroyViewSet(mixins.ListModelMixin,
@@ -6,3 +18,125 @@ class ListCreateDestroyViewSet(mixins.ListModelMixin,
                                mixins.DestroyModelMixin,
                                viewsets.GenericViewSet):
     pass
+
+
+class OptionalCursorPaginationMixin:
+    """Курсорная пагинация по запросу клиента.
+
+    Если в запросе есть параметр `cursor` (в том числе пустой),
+    используется курсорная пагинация, иначе — пагинация по умолчанию.
+    """
+    cursor_pagination_class = PubDateCursorPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            cursor_param = self.cursor_pagination_class.cursor_query_param
+            if cursor_param in self.request.query_params:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
+
+
+class CachedListMixin:
+    """Кэширование ответа list по строке запроса.
+
+    Кэш сбрасывается сигналами при создании и удалении объектов модели.
+    """
+    list_cache_timeout = LIST_CACHE_TIMEOUT
+
+    def list(self, request, *args, **kwargs):
+        key = list_cache_key(self.queryset.model, request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        cache.set(key, response.data, self.list_cache_timeout)
+        return response
+
+
+class ConditionalListMixin:
+    """ETag для list.
+
+    Валидатор строится по версиям таблиц из etag_models до обращения
+    к данным, поэтому ответ 304 обходится без запросов и сериализации.
+    Last-Modified не отдается: у него точность в секунду, и изменение
+    в ту же секунду вернуло бы клиенту устаревший ответ 304.
+    """
+    etag_models = ()
+
+    def get_etag_models(self):
+        return self.etag_models or (self.queryset.model,)
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        versions = get_versions(*self.get_etag_models())
+        etag = '"{}"'.format(request_digest(request, *versions))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().list, *args, **kwargs
+        )
+
+
+class ConditionalGetMixin(ConditionalListMixin):
+    """ETag для list и retrieve."""
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class ParentObjectMixin:
+    """Родительские объекты вложенных маршрутов.
+
+    Объект загружается один раз за запрос: экземпляр вьюсета создается
+    на каждый запрос, поэтому результаты хранятся прямо в нем.
+    """
+
+    def get_parent(self, model, **lookups):
+        """Объект модели по kwargs URL: {поле модели: имя kwarg}."""
+        filters = {
+            field: self.kwargs.get(kwarg) for field, kwarg in lookups.items()
+        }
+        key = (model, tuple(sorted(filters.items())))
+        parents = self.__dict__.setdefault('_parent_objects', {})
+        if key not in parents:
+            parents[key] = get_object_or_404(model, **filters)
+        return parents[key]
+
+
+class GroupStatsMixin:
+    """Сводка по произведениям жанра или категории: /{slug}/stats/.
+
+    Сводка читается одним запросом из таблицы, которую поддерживают
+    сигналы. Если строки нет, например после загрузки данных в обход
+    сигналов, сводка считается заново и сохраняется get_or_create.
+    """
+
+    @action(detail=True, serializer_class=GroupStatsSerializer)
+    def stats(self, request, *args, **kwargs):
+        model = self.queryset.model
+        stats_model, _ = STATS_MODELS[model]
+        lookup = {self.lookup_field: self.kwargs[self.lookup_field]}
+        stats = stats_model.objects.filter(**{
+            f'{model._meta.model_name}__{field}': value
+            for field, value in lookup.items()
+        }).first()
+        if stats is None:
+            # Строки создают миграция и сигналы; если ее все же нет,
+            # параллельные запросы создадут ее один раз.
+            group = get_object_or_404(self.queryset, **lookup)
+            values = count_stats(self.queryset.filter(pk=group.pk))
+            stats, _ = stats_model.objects.get_or_create(
+                pk=group.pk, defaults=values[group.pk]
+            )
+        return Response(self.get_serializer(stats).data)
@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PubDateCursorPagination(CursorPagination):
+    """Курсорная пагинация по дате публикации.
+
+    Позиция хранится в курсоре, поэтому глубокие страницы
+    не требуют ни COUNT(*), ни OFFSET.
+    """
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
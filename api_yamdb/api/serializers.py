@@ -1,18 +1,21 @@
 import re
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
-from django.db.models import Avg
-from django.forms import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from rest_framework import serializers
 
 from api_yamdb.settings import START_YEAR
 from reviews.models import (Category,
                             Genre,
                             Title,
+                            TitleGenre,
                             current_year,
                             Review,
                             Comment
                             )
+from reviews.stats import shift_stats, title_changes, title_histogram
+from reviews.top import update_top
+from reviews.versions import bump_versions
 
 User = get_user_model()
 
@@ -54,6 +57,9 @@ class UserSerializer(serializers.ModelSerializer):
 
 class NewUserSerializer(serializers.ModelSerializer):
     """Сериалайзер нового пользоватея"""
+    username = serializers.CharField(max_length=150)
+    email = serializers.EmailField(max_length=254)
+
     class Meta:
         model = User
         fields = (
@@ -71,6 +77,43 @@ class NewUserSerializer(serializers.ModelSerializer):
             )
         return value
 
+    def validate(self, data):
+        """Проверка занятых username и email одним запросом.
+
+        Если пользователь с такой парой уже есть, он становится
+        instance сериалайзера и save() его не перезаписывает.
+        """
+        errors = {}
+        users = User.objects.filter(
+            Q(username=data['username']) | Q(email=data['email'])
+        )
+        for user in users:
+            if (user.username, user.email) == (
+                    data['username'], data['email']):
+                self.instance = user
+                return data
+            if user.username == data['username']:
+                errors['username'] = 'Это имя пользователя занято.'
+            else:
+                errors['email'] = 'Этот email занят.'
+        if errors:
+            raise serializers.ValidationError(errors)
+        return data
+
+    def create(self, validated_data):
+        # Ошибка уникальности обрывает всю транзакцию вызывающего
+        # кода, поэтому точка сохранения не нужна.
+        try:
+            with transaction.atomic(savepoint=False):
+                return User.objects.create(**validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                'Имя пользователя или email заняты.'
+            )
+
+    def update(self, instance, validated_data):
+        return instance
+
 
 class TokenSerializer(serializers.ModelSerializer):
     """Сериалайзер JWT-токена."""
@@ -97,14 +140,17 @@ class GenreSerializer(serializers.ModelSerializer):
         lookup_field = 'slug'
 
 
+class GenreSlugsField(serializers.ListField):
+    """Список slug жанров произведения."""
+    child = serializers.SlugField()
+
+    def to_representation(self, value):
+        return [genre.slug for genre in value.all()]
+
+
 class TitleWriteSerializer(serializers.ModelSerializer):
     """Сериалайзер произведений."""
-    genre = serializers.SlugRelatedField(
-        slug_field='slug',
-        queryset=Genre.objects.all(),
-        many=True,
-        required=False,
-    )
+    genre = GenreSlugsField(required=False)
 
     category = serializers.SlugRelatedField(
         slug_field='slug',
@@ -125,28 +171,86 @@ class TitleWriteSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Год не подходит')
         return year
 
+    def validate_genre(self, slugs):
+        """Все жанры одним запросом; неизвестные slug — одной ошибкой."""
+        slugs = list(dict.fromkeys(slugs))
+        genres = Genre.objects.in_bulk(slugs, field_name='slug')
+        unknown = [slug for slug in slugs if slug not in genres]
+        if unknown:
+            raise serializers.ValidationError(
+                f'Жанры не найдены: {", ".join(unknown)}.'
+            )
+        return [genres[slug] for slug in slugs]
+
+    def set_genres(self, title, genres, histogram):
+        # bulk_create не отправляет m2m_changed, поэтому сводки
+        # жанров сдвигаются здесь же.
+        TitleGenre.objects.bulk_create(
+            TitleGenre(title=title, genre=genre) for genre in genres
+        )
+        shift_stats(
+            title_changes(title.pk, 1, histogram),
+            genres=[genre.pk for genre in genres],
+        )
+        bump_versions(TitleGenre)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        genres = validated_data.pop('genre', [])
+        title = super().create(validated_data)
+        if genres:
+            self.set_genres(title, genres, histogram={})
+        return title
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        genres = validated_data.pop('genre', None)
+        instance = super().update(instance, validated_data)
+        if genres is not None:
+            links = TitleGenre.objects.filter(title=instance)
+            histogram = title_histogram(instance.pk)
+            shift_stats(
+                title_changes(instance.pk, -1, histogram),
+                genres=links.values('genre'),
+            )
+            links.delete()
+            self.set_genres(instance, genres, histogram)
+            update_top(instance.pk)
+        return instance
+
 
 class TitleViewSerializer(serializers.ModelSerializer):
     """Сериалайзер произведений."""
     genre = GenreSerializer(many=True, required=False)
     category = CategorySerializer(required=True,)
-    rating = serializers.SerializerMethodField()
+    rating = serializers.FloatField(read_only=True)
+    weighted_rating = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Title
         fields = (
-            'id', 'name', 'year', 'rating', 'description', 'genre', 'category'
-        )
-        read_only_fields = (
-            'id', 'name', 'year', 'rating', 'description', 'genre', 'category'
+            'id', 'name', 'year', 'rating', 'weighted_rating',
+            'description', 'genre', 'category'
         )
+        read_only_fields = fields
 
-    def get_rating(self, obj):
-        """Подсчет рейтинга произведения."""
-        if obj.reviews.count() == 0:
-            return None
-        r = Review.objects.filter(title=obj).aggregate(rating=Avg('score'))
-        return r['rating']
+
+class TrendingTitleSerializer(TitleViewSerializer):
+    """Сериалайзер произведений в трендах."""
+    trending_score = serializers.FloatField(read_only=True)
+
+    class Meta(TitleViewSerializer.Meta):
+        fields = TitleViewSerializer.Meta.fields + ('trending_score',)
+        read_only_fields = fields
+
+
+class TopTitleSerializer(serializers.ModelSerializer):
+    """Сериалайзер произведения в списке лучших."""
+
+    class Meta:
+        model = Title
+        fields = ('id', 'name', 'year', 'rating', 'weighted_rating')
+        read_only_fields = fields
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -161,18 +265,6 @@ class ReviewSerializer(serializers.ModelSerializer):
         read_only=True
     )
 
-    def validate(self, data):
-        request = self.context['request']
-        title_id = self.context['view'].kwargs.get('title_id')
-        title = get_object_or_404(Title, pk=title_id)
-        if request.method == 'POST':
-            if Review.objects.filter(
-                    title=title,
-                    author=request.user).exists():
-                raise ValidationError(
-                    'Допустимо не более 1 отзыва на произведение')
-        return data
-
     def validate_score(self, score):
         if score < 1 or score > 10:
             raise serializers.ValidationError(
@@ -200,3 +292,11 @@ class CommentSerializer(serializers.ModelSerializer):
             'id', 'text', 'author', 'pub_date', 'review'
         )
         model = Comment
+
+
+class GroupStatsSerializer(serializers.Serializer):
+    """Сериалайзер сводки по произведениям жанра или категории."""
+    title_count = serializers.IntegerField()
+    review_count = serializers.IntegerField()
+    mean_score = serializers.FloatField()
+    histogram = serializers.DictField(child=serializers.IntegerField())
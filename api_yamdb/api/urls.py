@@ -2,7 +2,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 from api.views import (UserViewSet, NewUserView, TokenView,
                        CategoryViewSet, GenreViewSet, TitleViewSet,
-                       ReviewViewSet, CommentViewSet
+                       ReviewViewSet, CommentViewSet, MetricsView
                        )
 
 app_name = 'api'
@@ -26,4 +26,5 @@ urlpatterns = [
     path('v1/', include(router_v1.urls)),
     path('v1/auth/signup/', NewUserView.as_view()),
     path('v1/auth/token/', TokenView.as_view()),
+    path('v1/metrics/', MetricsView.as_view()),
 ]
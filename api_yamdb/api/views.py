@@ -1,23 +1,33 @@
 
 
-from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
+from django.db import IntegrityError, transaction
+from django.db.models import ExpressionWrapper, F, FloatField
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
 from rest_framework import filters, viewsets, status, views
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework.settings import api_settings
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import (AllowAny,
                                         IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
-from reviews.models import Category, Genre, Review, Title
+from reviews.models import (Category, Comment, Genre, Review, Title,
+                            TopTitle, TrendEpoch)
+from reviews.suggest import suggest_index
+from reviews.trending import MIN_TREND_SCORE, decay_factor
 from users.models import User
+from users.outbox import enqueue_email
 
-from .mixins import ListCreateDestroyViewSet
-from .filters import TitleFilter
+from .authentication import get_access_token, get_full_user
+from .metrics import metrics_report
+from .mixins import (CachedListMixin, ConditionalGetMixin,
+                     ConditionalListMixin, GroupStatsMixin,
+                     ListCreateDestroyViewSet, OptionalCursorPaginationMixin,
+                     ParentObjectMixin)
+from .filters import TitleFilter, TitleGroupFilter
 from .serializers import (UserSerializer,
                           NewUserSerializer,
                           TokenSerializer,
@@ -25,6 +35,8 @@ from .serializers import (UserSerializer,
                           GenreSerializer,
                           TitleViewSerializer,
                           TitleWriteSerializer,
+                          TopTitleSerializer,
+                          TrendingTitleSerializer,
                           ReviewSerializer,
                           CommentSerializer)
 from .permissions import (AdminModeratorAuthorOrReadOnly,
@@ -49,7 +61,7 @@ class UserViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def me(self, request):
-        user = request.user
+        user = get_full_user(request.user)
         if request.method == 'PATCH':
             serializer = self.get_serializer(
                 user,
@@ -57,7 +69,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 partial=True
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save(role=request.user.role)
+            serializer.save(role=user.role)
 # Паша, привет! Не понимать, как реализовать "в валидаци данных обычного
 # стерилизатора (XD) отсекать изменение роли",
 # но, если правильно поняла, то такая реализация возможна,
@@ -72,40 +84,40 @@ class NewUserView(views.APIView):
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
-        if User.objects.filter(
-            username=request.data.get('username'),
-            email=request.data.get('email'),
-        ).exists():
-            user, created = User.objects.get_or_create(
-                username=request.data.get('username')
-            )
-            if created is False:
-                confirmation_code = default_token_generator.make_token(user)
-                user.confirmation_code = confirmation_code
-                user.save()
-                return Response('Ваш код обновлен', status=status.HTTP_200_OK)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-
-        user = User.objects.get(username=request.data['username'],
-                                email=request.data['email'])
-        confirmation_code = default_token_generator.make_token(user)
-        user.confirmation_code = confirmation_code
-        send_mail(
-            subject='Подтверждение регистрации на Yamdb',
-            message=(
-                f'Для регистрации пользователя {user.username}'
-                'отправьте запрос на /api/v1/auth/token/, '
-                'указав имя пользователя '
-                f'и {confirmation_code}. '
-
-            ),
-            from_email=settings.FROM_EMAIL,
-            recipient_list=[user.email]
-        )
+        if serializer.instance is not None:
+            user = serializer.save()
+            User.objects.filter(pk=user.pk).update(
+                confirmation_code=default_token_generator.make_token(user)
+            )
+            return Response('Ваш код обновлен', status=status.HTTP_200_OK)
+        # Пользователь и письмо с кодом сохраняются в одной транзакции:
+        # если письмо не встало в очередь, пользователь не создается.
+        with transaction.atomic():
+            user = serializer.save()
+            confirmation_code = default_token_generator.make_token(user)
+            enqueue_email(
+                subject='Подтверждение регистрации на Yamdb',
+                message=(
+                    f'Для регистрации пользователя {user.username}'
+                    'отправьте запрос на /api/v1/auth/token/, '
+                    'указав имя пользователя '
+                    f'и {confirmation_code}. '
+
+                ),
+                recipient=user.email,
+            )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class MetricsView(views.APIView):
+    """Сводка метрик запросов по представлениям."""
+    permission_classes = (IsAuthenticated, AdminOnly,)
+
+    def get(self, request):
+        return Response(metrics_report.as_dict(), status=status.HTTP_200_OK)
+
+
 class TokenView(views.APIView):
 
     def post(self, request):
@@ -115,9 +127,9 @@ class TokenView(views.APIView):
         user = get_object_or_404(User, username=data['username'])
         confirmation_code = data['confirmation_code']
         if default_token_generator.check_token(user, confirmation_code):
-            token = AccessToken.for_user(user)
+            token = get_access_token(user)
             return Response(
-                {'token': token},
+                {'token': str(token)},
                 status=status.HTTP_200_OK
             )
         return Response(
@@ -131,21 +143,87 @@ class TokenView(views.APIView):
         )
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Вьюсет произведений."""
     queryset = Title.objects.all()
+    etag_models = (Title, Genre, Category, Review)
     pagination_class = LimitOffsetPagination
     permission_classes = (AdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TitleFilter
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return Title.objects.select_related(
+                'category'
+            ).prefetch_related('genre')
+        if self.action == 'trending':
+            epoch = TrendEpoch.objects.filter(pk=1).first()
+            factor = decay_factor(epoch.timestamp) if epoch else 0.0
+            return Title.objects.filter(
+                trend__score__gte=MIN_TREND_SCORE
+            ).annotate(
+                trending_score=ExpressionWrapper(
+                    F('trend__score') * factor, output_field=FloatField()
+                ),
+            ).select_related(
+                'category'
+            ).prefetch_related('genre').order_by('-trend__score', 'id')
+        return super().get_queryset()
+
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PATCH'):
             return TitleWriteSerializer
+        if self.action == 'trending':
+            return TrendingTitleSerializer
+        if self.action == 'top':
+            return TopTitleSerializer
         return TitleViewSerializer
 
+    @action(detail=False, filterset_class=TitleGroupFilter)
+    def trending(self, request):
+        """Произведения по убыванию недавней активности отзывов."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
-class GenreViewSet(ListCreateDestroyViewSet):
+    @action(detail=False)
+    def suggest(self, request):
+        """Подсказки по началу названия из индекса в памяти, без базы."""
+        return Response([
+            {'id': title_id, 'name': name, 'review_count': review_count}
+            for title_id, name, review_count in suggest_index.suggest(
+                request.query_params.get('q', '')
+            )
+        ])
+
+    @action(detail=False)
+    def top(self, request):
+        """Лучшие произведения каждого жанра и категории одним запросом."""
+        entries = TopTitle.objects.select_related(
+            'title', 'genre', 'category'
+        ).order_by('-rating', 'title_id')
+        groups = {'genres': {}, 'categories': {}}
+        for entry in entries:
+            if entry.genre_id is not None:
+                titles = groups['genres'].setdefault(entry.genre.slug, [])
+            else:
+                titles = groups['categories'].setdefault(
+                    entry.category.slug, []
+                )
+            titles.append(entry.title)
+        return Response({
+            key: {
+                slug: self.get_serializer(titles, many=True).data
+                for slug, titles in sorted(lists.items())
+            }
+            for key, lists in groups.items()
+        })
+
+
+class GenreViewSet(GroupStatsMixin, ConditionalListMixin, CachedListMixin,
+                   ListCreateDestroyViewSet):
     """Вьюсет жанров."""
     queryset = Genre.objects.all()
     pagination_class = LimitOffsetPagination
@@ -156,7 +234,8 @@ class GenreViewSet(ListCreateDestroyViewSet):
     lookup_field = 'slug'
 
 
-class CategoryViewSet(ListCreateDestroyViewSet):
+class CategoryViewSet(GroupStatsMixin, ConditionalListMixin,
+                      CachedListMixin, ListCreateDestroyViewSet):
     """Вьюсет категорий."""
     queryset = Category.objects.all()
     pagination_class = LimitOffsetPagination
@@ -167,40 +246,68 @@ class CategoryViewSet(ListCreateDestroyViewSet):
     lookup_field = 'slug'
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ParentObjectMixin, ConditionalGetMixin,
+                    OptionalCursorPaginationMixin, viewsets.ModelViewSet):
     """Вьюсет для рецензий."""
+    etag_models = (Review, Title, User)
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,
                           AdminModeratorAuthorOrReadOnly,)
 
     def get_title(self):
-        return get_object_or_404(Title, id=self.kwargs.get('title_id'))
+        return self.get_parent(Title, pk='title_id')
 
     def get_queryset(self):
-        return self.get_title().reviews.select_related('author').all()
+        if self.action == 'list':
+            return self.get_title().reviews.select_related('author').all()
+        # Отзыв читается вместе с произведением: оно нужно в ответе,
+        # и 404 для чужого произведения дает тот же запрос.
+        return Review.objects.filter(
+            title_id=self.kwargs['title_id']
+        ).select_related('author', 'title')
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, title=self.get_title())
+        # Повторный отзыв отсекает ограничение unique_review в базе:
+        # без лишнего запроса и без гонки между проверкой и вставкой.
+        # Вместе с отзывом в транзакции работают сигналы, поэтому
+        # ошибку переводим, только если отзыв автора уже есть.
+        title = self.get_title()
+        try:
+            with transaction.atomic():
+                serializer.save(
+                    author=get_full_user(self.request.user), title=title,
+                )
+        except IntegrityError:
+            if not Review.objects.filter(
+                title=title, author_id=self.request.user.id
+            ).exists():
+                raise
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Допустимо не более 1 отзыва на произведение'
+                ]
+            })
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ParentObjectMixin, ConditionalGetMixin,
+                     OptionalCursorPaginationMixin, viewsets.ModelViewSet):
     """Вьюсет для комментариев."""
+    etag_models = (Comment, Review, User)
     serializer_class = CommentSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,
                           AdminModeratorAuthorOrReadOnly,)
 
+    def get_review(self):
+        return self.get_parent(Review, pk='review_id', title_id='title_id')
+
     def get_queryset(self):
-        review = get_object_or_404(
-            Review, pk=self.kwargs.get('review_id'),
-            title_id=self.kwargs.get('title_id')
-        )
-        return review.comments.all()
+        return self.get_review().comments.all()
 
     def perform_create(self, serializer):
-        review = get_object_or_404(
-            Review, pk=self.kwargs.get('review_id'),
-            title_id=self.kwargs.get('title_id')
-        )
         serializer.save(
-            author=self.request.user, review=review
+            author=get_full_user(self.request.user), review=self.get_review()
         )
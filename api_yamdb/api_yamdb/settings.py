@@ -37,6 +37,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.QueryMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'api_yamdb.urls'
@@ -71,6 +72,45 @@ DATABASES = {
 }
 
 
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Версии таблиц должны быть общими для всех процессов сервера:
+    # по ним сбрасываются кэши в памяти процессов. Файлового кэша
+    # хватает на одной машине, для нескольких нужен Redis или Memcached.
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'versions'),
+    },
+}
+
+# Метрики запросов: бюджеты числа SQL-запросов по имени представления.
+# Ключ без метода относится к чтению, «МЕТОД имя» — к одному методу.
+# В боевом режиме метрики включаются явно.
+QUERY_METRICS_ENABLED = DEBUG
+DEFAULT_QUERY_BUDGET = 10
+QUERY_BUDGETS = {
+    'api:titles-list': 5,
+    'api:titles-detail': 4,
+    'api:reviews-list': 5,
+    'api:comments-list': 5,
+    'api:categories-list': 3,
+    'api:genres-list': 3,
+    # Удаление отзыва: каскад комментариев и по запросу на рейтинг,
+    # тренд, сводки жанров и категории, списки лучших и версии.
+    'DELETE api:reviews-detail': 11,
+}
+
+# Кэш версий таблиц. Если он живет в памяти процесса (locmem),
+# версии читаются из базы на каждый запрос.
+TABLE_VERSION_CACHE = 'versions'
+# Сколько секунд версия таблицы живет в кэше до перечитывания из базы.
+TABLE_VERSION_CACHE_TIMEOUT = 60
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -124,7 +164,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
 
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
@@ -139,4 +179,20 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# StatelessJWTAuthentication берет права из клеймов токена и сверяет
+# только версию прав пользователя в кэше AUTH_VERSION_CACHE, без запроса
+# к базе. Чтобы включить ее, укажите в DEFAULT_AUTHENTICATION_CLASSES
+# 'api.authentication.StatelessJWTAuthentication'. Кэш должен быть общим
+# для всех процессов: с locmem версия читается из базы на каждый запрос.
+AUTH_VERSION_CACHE = 'versions'
+
+# Кэш пользователей для JWT-аутентификации: размер и время жизни в секундах.
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 60
+
 START_YEAR = 1600
+
+# Параметры взвешенного рейтинга произведений; после изменения
+# выполните manage.py recount_ratings.
+RATING_PRIOR_MEAN = 5.5
+RATING_MIN_VOTES = 5
@@ -1,29 +1,297 @@
 import csv
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
-from reviews.models import Category, Comment, Genre, Review, Title, User
+from reviews.bulk import batches, keep_auto_dates, reset_sequences
+from reviews.models import (Category, Comment, Genre, Review, Title,
+                            TitleGenre, User)
+from reviews.search import search_backend
+from reviews.stats import rebuild_all_stats
+from reviews.suggest import suggest_index
+from reviews.top import rebuild_top
+from reviews.trending import rebuild_trends
+from reviews.versions import bump_versions
 
 TABLES = {
     User: 'users.csv',
     Category: 'category.csv',
     Genre: 'genre.csv',
     Title: 'titles.csv',
+    TitleGenre: 'genre_title.csv',
     Review: 'review.csv',
     Comment: 'comments.csv',
 }
 
+BATCH_SIZE = 1000
+# Сколько готовых пачек таблицы может ждать записи в очереди.
+QUEUE_SIZE = 4
 
-class Command(BaseCommand):
 
-    def handle(self, *args, **kwargs):
-        for model, csv_f in TABLES.items():
-            with open(
-                f'{settings.BASE_DIR}/static/data/{csv_f}',
-                'r',
-                encoding='utf-8'
-            ) as csv_file:
+def column_map(model, columns):
+    """Сопоставление колонок CSV с полями модели.
+
+    Колонки с именем внешнего ключа (`author`, `category`) пишутся
+    прямо в `<поле>_id`, без запросов к связанной таблице.
+    """
+    return {column: model._meta.get_field(column) for column in columns}
+
+
+def clean_value(field, value):
+    if value == '' and field.null:
+        return None
+    return field.to_python(value)
+
+
+def read_objects(model, reader, mapping):
+    """Построчное чтение CSV в несохраненные объекты модели."""
+    for row in reader:
+        yield model(**{
+            field.attname: clean_value(field, row[column])
+            for column, field in mapping.items()
+        })
+
+
+def upsert_batch(model, batch, fields):
+    """Вставка новых и обновление измененных строк пачки.
+
+    Существующие строки выбираются одним запросом по первичным ключам,
+    неизмененные строки не трогаются.
+    Возвращает количество созданных, обновленных и пропущенных строк.
+    """
+    existing = model.objects.in_bulk([obj.pk for obj in batch])
+    new, changed = [], []
+    for obj in batch:
+        current = existing.get(obj.pk)
+        if current is None:
+            new.append(obj)
+        elif any(
+            getattr(obj, field) != getattr(current, field)
+            for field in fields
+        ):
+            changed.append(obj)
+    if new:
+        model.objects.bulk_create(new)
+    if changed and fields:
+        model.objects.bulk_update(changed, fields)
+    return len(new), len(changed), len(batch) - len(new) - len(changed)
+
+
+def dependency_levels(models):
+    """Разбиение моделей на уровни по графу внешних ключей.
+
+    Модели одного уровня не ссылаются друг на друга, их можно
+    загружать независимо; каждый уровень зависит только от предыдущих.
+    """
+    dependencies = {
+        model: {
+            field.related_model for field in model._meta.concrete_fields
+            if field.is_relation
+            and field.related_model in models
+            and field.related_model is not model
+        }
+        for model in models
+    }
+    levels = []
+    while dependencies:
+        ready = [model for model, deps in dependencies.items() if not deps]
+        if not ready:
+            raise CommandError(
+                'Циклическая зависимость между таблицами: '
+                + ', '.join(model.__name__ for model in dependencies)
+            )
+        levels.append(ready)
+        for model in ready:
+            del dependencies[model]
+        for deps in dependencies.values():
+            deps.difference_update(ready)
+    return levels
+
+
+class TableReader:
+    """Разбор CSV-файла в пачки объектов в отдельном потоке.
+
+    Готовые пачки складываются в ограниченную очередь, поэтому
+    разбор опережает запись не больше чем на QUEUE_SIZE пачек.
+    """
+    done = object()
+
+    def __init__(self, model, path, batch_size):
+        self.model = model
+        self.path = path
+        self.batch_size = batch_size
+        self.fields = None
+        self.cancelled = False
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+
+    def put(self, item):
+        while not self.cancelled:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def cancel(self):
+        """Остановка разбора, если запись таблиц прервалась."""
+        self.cancelled = True
+
+    def read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as csv_file:
                 reader = csv.DictReader(csv_file)
-                model.objects.bulk_create(
-                    model(**data) for data in reader)
+                mapping = column_map(self.model, reader.fieldnames)
+                self.fields = [
+                    field.attname for field in mapping.values()
+                    if not field.primary_key
+                ]
+                objects = read_objects(self.model, reader, mapping)
+                for batch in batches(objects, self.batch_size):
+                    if self.cancelled:
+                        return
+                    self.put(batch)
+        except Exception as error:
+            self.put(error)
+        else:
+            self.put(self.done)
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is self.done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+class Command(BaseCommand):
+    help = 'Загружает данные из CSV-файлов в базу данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(settings.BASE_DIR, 'static', 'data'),
+            help='Каталог с CSV-файлами.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество строк в одной пачке INSERT.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=min(4, os.cpu_count() or 1),
+            help='Количество потоков для разбора и записи таблиц.',
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help=(
+                'Добавить новые и обновить измененные строки '
+                'в уже заполненной базе.'
+            ),
+        )
+
+    def write_table(self, reader, upsert=False):
+        model = reader.model
+        started = time.monotonic()
+        created = updated = skipped = 0
+        with transaction.atomic(), keep_auto_dates(model):
+            for batch in reader:
+                if upsert:
+                    counts = upsert_batch(model, batch, reader.fields)
+                else:
+                    model.objects.bulk_create(batch)
+                    counts = (len(batch), 0, 0)
+                created += counts[0]
+                updated += counts[1]
+                skipped += counts[2]
+        elapsed = time.monotonic() - started
+        count = created + updated + skipped
+        report = (
+            f'{model.__name__}: {count} строк за {elapsed:.2f} с '
+            f'({count / elapsed if elapsed else 0:.0f} строк/с)'
+        )
+        if upsert:
+            report += (
+                f'; добавлено {created}, обновлено {updated}, '
+                f'без изменений {skipped}'
+            )
+        self.stdout.write(report)
+
+    def write_table_in_thread(self, reader, upsert=False):
+        try:
+            self.write_table(reader, upsert)
+        finally:
+            connection.close()
+
+    def write_level(self, readers, upsert, workers):
+        """Запись таблиц одного уровня графа зависимостей.
+
+        SQLite допускает только одного писателя, поэтому там таблицы
+        пишутся по очереди; остальные СУБД пишут их параллельно,
+        каждая таблица в своем соединении.
+        """
+        if connection.vendor == 'sqlite' or workers == 1 or len(readers) == 1:
+            for reader in readers:
+                self.write_table(reader, upsert)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as writers:
+            futures = [
+                writers.submit(self.write_table_in_thread, reader, upsert)
+                for reader in readers
+            ]
+            for future in futures:
+                future.result()
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        if options['workers'] < 1:
+            raise CommandError('--workers должен быть больше нуля.')
+        levels = [
+            [
+                TableReader(
+                    model,
+                    os.path.join(options['path'], TABLES[model]),
+                    options['batch_size'],
+                )
+                for model in level
+            ]
+            for level in dependency_levels(list(TABLES))
+        ]
+        with ThreadPoolExecutor(max_workers=options['workers']) as parsers:
+            # Потоки разбирают CSV в порядке уровней, пока основной
+            # поток записывает уже готовые пачки.
+            for level in levels:
+                for reader in level:
+                    parsers.submit(reader.read)
+            try:
+                for level in levels:
+                    self.write_level(
+                        level, options['upsert'], options['workers']
+                    )
+            except BaseException:
+                for level in levels:
+                    for reader in level:
+                        reader.cancel()
+                raise
+        reset_sequences(TABLES)
+        # bulk_create не отправляет сигналы, поэтому счетчики рейтинга,
+        # сводки жанров и категорий, списки лучших, тренды и версии
+        # таблиц обновляем после загрузки.
+        Title.objects.all().recount_ratings()
+        rebuild_all_stats()
+        rebuild_top()
+        search_backend().rebuild()
+        suggest_index.invalidate()
+        rebuild_trends()
+        bump_versions(*TABLES)
@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+
+from reviews.search import search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает поисковый индекс произведений. Нужен после '
+        'смены TITLE_SEARCH_BACKEND или загрузки данных в обход сигналов.'
+    )
+
+    def handle(self, *args, **options):
+        backend = search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковый индекс {type(backend).__name__} пересчитан.'
+        ))
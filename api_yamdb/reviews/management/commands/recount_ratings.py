@@ -0,0 +1,42 @@
+from django.core.management import BaseCommand, CommandError
+
+from reviews.models import Title
+from reviews.top import rebuild_top
+from reviews.versions import bump_versions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики рейтинга произведений.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счетчики, ничего не сохраняя.',
+        )
+
+    def handle(self, *args, **options):
+        broken = Title.objects.all().recount_ratings(
+            commit=not options['check']
+        )
+        for title in broken:
+            self.stdout.write(
+                f'Произведение id={title.pk}: '
+                f'score_sum={title.score_sum}, '
+                f'review_count={title.review_count}'
+            )
+        if options['check'] and broken:
+            raise CommandError(
+                f'Счетчики рейтинга расходятся у {len(broken)} произведений.'
+            )
+        if broken and not options['check']:
+            rebuild_top()
+            bump_versions(Title)
+        if options['check']:
+            self.stdout.write(
+                self.style.SUCCESS('Счетчики рейтинга в порядке.')
+            )
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено произведений: {len(broken)}.'
+        ))
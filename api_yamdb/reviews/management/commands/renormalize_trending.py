@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+
+from reviews.trending import rebuild_trends, renormalize_trends
+
+
+class Command(BaseCommand):
+    help = (
+        'Сдвигает отметку отсчета оценок трендов на текущий момент. '
+        'Запускайте периодически, например раз в сутки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Пересчитать оценки трендов заново по таблице отзывов.',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = rebuild_trends()
+            self.stdout.write(self.style.SUCCESS(
+                f'Оценки трендов пересчитаны для {count} произведений.'
+            ))
+            return
+        kept, removed = renormalize_trends()
+        self.stdout.write(self.style.SUCCESS(
+            f'Оценки трендов нормализованы: осталось {kept}, '
+            f'удалено {removed}.'
+        ))
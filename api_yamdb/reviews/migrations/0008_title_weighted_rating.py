@@ -0,0 +1,40 @@
+# Generated by Django 3.2 on 2026-10-18 20:35
+
+from django.conf import settings
+from django.db import migrations, models
+import reviews.models
+
+
+def fill_weighted_rating(apps, schema_editor):
+    # Формула зафиксирована здесь, а не взята из reviews.models: миграция
+    # не должна меняться вместе с текущим кодом моделей.
+    prior_mean = getattr(settings, 'RATING_PRIOR_MEAN', 5.5)
+    min_votes = getattr(settings, 'RATING_MIN_VOTES', 5)
+    Title = apps.get_model('reviews', 'Title')
+    Title.objects.filter(review_count__gt=0).update(
+        weighted_rating=models.ExpressionWrapper(
+            (models.F('score_sum') + min_votes * prior_mean)
+            / (models.F('review_count') + min_votes),
+            output_field=models.FloatField(),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_group_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='weighted_rating',
+            field=models.FloatField(default=reviews.models.prior_rating, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['-weighted_rating', 'id'], name='title_weighted_rating_idx'),
+        ),
+        migrations.RunPython(fill_weighted_rating, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2 on 2026-10-18 20:38
+
+import math
+import time
+from collections import defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Период полураспада по умолчанию, как в reviews.trending.
+HALF_LIFE = 3 * 24 * 60 * 60
+
+
+def fill_title_trends(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    TitleTrend = apps.get_model('reviews', 'TitleTrend')
+    TrendEpoch = apps.get_model('reviews', 'TrendEpoch')
+    now = time.time()
+    TrendEpoch.objects.create(pk=1, timestamp=now)
+    scores = defaultdict(float)
+    reviews = Review.objects.order_by().values_list('title_id', 'pub_date')
+    for title_id, pub_date in reviews.iterator():
+        scores[title_id] += math.exp(
+            math.log(2) / HALF_LIFE * (pub_date.timestamp() - now)
+        )
+    TitleTrend.objects.bulk_create(
+        TitleTrend(title_id=title_id, score=score)
+        for title_id, score in scores.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_title_weighted_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleTrend',
+            fields=[
+                ('title', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='reviews.title')),
+                ('score', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.FloatField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='titletrend',
+            index=models.Index(fields=['-score'], name='title_trend_score_idx'),
+        ),
+        migrations.RunPython(fill_title_trends, migrations.RunPython.noop),
+    ]
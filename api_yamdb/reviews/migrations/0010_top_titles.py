@@ -0,0 +1,59 @@
+# Generated by Django 3.2 on 2026-10-18 20:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Размер списка по умолчанию, как в reviews.top.
+TOP_SIZE = 10
+
+
+def fill_top_titles(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    TopTitle = apps.get_model('reviews', 'TopTitle')
+    for field, model_name in (('genre', 'Genre'), ('category', 'Category')):
+        Group = apps.get_model('reviews', model_name)
+        for group_id in Group.objects.values_list('pk', flat=True):
+            titles = Title.objects.filter(
+                **{field: group_id}, review_count__gt=0
+            ).order_by('-weighted_rating', 'id')[:TOP_SIZE]
+            TopTitle.objects.bulk_create(
+                TopTitle(
+                    **{field + '_id': group_id},
+                    title_id=title.pk,
+                    rating=title.weighted_rating,
+                )
+                for title in titles
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0009_title_trends'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopTitle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.FloatField()),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='top_titles', to='reviews.category')),
+                ('genre', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='top_titles', to='reviews.genre')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.title')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='toptitle',
+            constraint=models.UniqueConstraint(fields=('genre', 'title'), name='unique_genre_top_title'),
+        ),
+        migrations.AddConstraint(
+            model_name='toptitle',
+            constraint=models.UniqueConstraint(fields=('category', 'title'), name='unique_category_top_title'),
+        ),
+        migrations.AddConstraint(
+            model_name='toptitle',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('category__isnull', False), ('genre__isnull', True)), models.Q(('category__isnull', True), ('genre__isnull', False)), _connector='OR'), name='top_title_single_group'),
+        ),
+        migrations.RunPython(fill_top_titles, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,115 @@
-from django.db import models
+import math
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, models, router
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
 from django.core.validators import MaxValueValidator, MinValueValidator
 import datetime as dt
 from users.models import User
 
 
 PER_PAGE: int = 10
+SCORES = range(1, 11)
+# Взвешенный рейтинг: средняя оценка, сглаженная к RATING_PRIOR_MEAN
+# так, будто у каждого произведения есть еще RATING_MIN_VOTES отзывов
+# с этой оценкой.
+RATING_PRIOR_MEAN = getattr(settings, 'RATING_PRIOR_MEAN', 5.5)
+RATING_MIN_VOTES = getattr(settings, 'RATING_MIN_VOTES', 5)
 
 
 def current_year():
     return dt.datetime.today().year
 
 
+def calc_rating(score_sum, review_count):
+    """Рейтинг по сумме оценок и количеству отзывов."""
+    if not review_count:
+        return None
+    return score_sum / review_count
+
+
+def calc_weighted_rating(score_sum, review_count):
+    """Байесовский рейтинг по сумме оценок и количеству отзывов."""
+    return (
+        (score_sum + RATING_MIN_VOTES * RATING_PRIOR_MEAN)
+        / (review_count + RATING_MIN_VOTES)
+    )
+
+
+def prior_rating():
+    return RATING_PRIOR_MEAN
+
+
+def deleting_titles(using=DEFAULT_DB_ALIAS):
+    """Произведения, которые удаляются через соединение using.
+
+    Их вклад в сводки снимается целиком до удаления, поэтому каскадное
+    удаление отзывов сводки, тренды и списки лучших уже не трогает.
+    """
+    connection = connections[using]
+    if not hasattr(connection, 'deleting_titles'):
+        connection.deleting_titles = set()
+    return connection.deleting_titles
+
+
+@contextmanager
+def title_deletion(using):
+    """Область удаления произведений.
+
+    Добавленные в deleting_titles за время удаления убираются после
+    него, даже если оно оборвалось: произведения тогда остались в базе.
+    """
+    titles = deleting_titles(using)
+    before = set(titles)
+    try:
+        yield
+    finally:
+        titles.intersection_update(before)
+
+
+class TitleQuerySet(models.QuerySet):
+
+    def delete(self):
+        with title_deletion(self.db):
+            return super().delete()
+
+    def recount_ratings(self, commit=True):
+        """Пересчет счетчиков рейтинга по таблице отзывов.
+
+        Возвращает список произведений, у которых счетчики или
+        взвешенный рейтинг расходились с фактическими данными
+        (например, после смены RATING_PRIOR_MEAN).
+        При commit=False ничего не сохраняет.
+        """
+        titles = self.annotate(
+            actual_sum=Coalesce(Sum('reviews__score'), 0),
+            actual_count=Count('reviews'),
+        )
+        broken = []
+        for title in titles.iterator():
+            weighted_rating = calc_weighted_rating(
+                title.actual_sum, title.actual_count
+            )
+            if (title.score_sum, title.review_count) == (
+                    title.actual_sum, title.actual_count) and math.isclose(
+                    title.weighted_rating, weighted_rating):
+                continue
+            title.score_sum = title.actual_sum
+            title.review_count = title.actual_count
+            title.rating = calc_rating(title.score_sum, title.review_count)
+            title.weighted_rating = weighted_rating
+            broken.append(title)
+        if commit and broken:
+            self.model.objects.bulk_update(
+                broken,
+                ('score_sum', 'review_count', 'rating', 'weighted_rating'),
+                batch_size=500,
+            )
+        return broken
+
+
 class Title(models.Model):
     """Модель произведений"""
     category = models.ForeignKey(
@@ -27,9 +126,38 @@ class Title(models.Model):
     name = models.CharField(max_length=200)
     year = models.IntegerField(default=current_year,)
     description = models.TextField(max_length=200, null=True,)
+    score_sum = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating = models.FloatField(null=True, blank=True, editable=False)
+    weighted_rating = models.FloatField(
+        default=prior_rating, editable=False
+    )
+
+    objects = TitleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-weighted_rating', 'id'],
+                name='title_weighted_rating_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
-        return self.category[:PER_PAGE]
+        return self.name[:PER_PAGE]
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        with title_deletion(using):
+            return super().delete(using, keep_parents)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем категорию из базы, чтобы при ее смене
+        # перенести вклад произведения в сводку категорий.
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        return instance
 
 
 class Category(models.Model):
@@ -94,13 +222,47 @@ class Review(models.Model):
                 name='unique_review',
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['title', 'pub_date'],
+                name='review_title_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.title}, {self.score}, {self.author}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем оценку из базы, чтобы при обновлении
+        # сдвинуть счетчики произведения на разницу.
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
+
+
+def bump_comment_version():
+    # versions импортирует модели, поэтому импорт здесь.
+    from .versions import bump_versions
+    bump_versions(Comment)
+
+
+class CommentQuerySet(models.QuerySet):
+
+    def delete(self):
+        deleted = super().delete()
+        bump_comment_version()
+        return deleted
+
 
 class Comment(models.Model):
-    """Модель комментария."""
+    """Модель комментария.
+
+    У комментариев нет обработчиков удаления, чтобы каскад от отзывов
+    и пользователей удалял их одним запросом, без выборки. Версию
+    таблицы меняют delete() модели и набора, а при каскаде — сигналы
+    удаления отзывов и пользователей.
+    """
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -121,5 +283,171 @@ class Comment(models.Model):
         db_index=True,
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['review', 'pub_date'],
+                name='comment_review_pub_date_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.text
+
+    def delete(self, *args, **kwargs):
+        deleted = super().delete(*args, **kwargs)
+        bump_comment_version()
+        return deleted
+
+
+class GroupStats(models.Model):
+    """Сводка по произведениям жанра или категории.
+
+    Хранит количество произведений и отзывов, сумму оценок
+    и гистограмму оценок; обновляется сигналами на разницу.
+    """
+    title_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    score_sum = models.PositiveIntegerField(default=0)
+    score_1 = models.PositiveIntegerField(default=0)
+    score_2 = models.PositiveIntegerField(default=0)
+    score_3 = models.PositiveIntegerField(default=0)
+    score_4 = models.PositiveIntegerField(default=0)
+    score_5 = models.PositiveIntegerField(default=0)
+    score_6 = models.PositiveIntegerField(default=0)
+    score_7 = models.PositiveIntegerField(default=0)
+    score_8 = models.PositiveIntegerField(default=0)
+    score_9 = models.PositiveIntegerField(default=0)
+    score_10 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def mean_score(self):
+        return calc_rating(self.score_sum, self.review_count)
+
+    @property
+    def histogram(self):
+        return {
+            score: getattr(self, f'score_{score}') for score in SCORES
+        }
+
+
+class GenreStats(GroupStats):
+    """Сводка по произведениям жанра."""
+    genre = models.OneToOneField(
+        Genre,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats',
+    )
+
+    def __str__(self):
+        return f'{self.genre_id}: {self.title_count}'
+
+
+class CategoryStats(GroupStats):
+    """Сводка по произведениям категории."""
+    category = models.OneToOneField(
+        Category,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats',
+    )
+
+    def __str__(self):
+        return f'{self.category_id}: {self.title_count}'
+
+
+class TitleTrend(models.Model):
+    """Оценка тренда произведения по недавним отзывам.
+
+    Отзыв с датой t добавляет exp(k * (t - epoch)), где epoch —
+    отметка из TrendEpoch. Чтобы получить оценку на текущий момент,
+    score умножается на exp(-k * (now - epoch)). Множитель общий
+    для всех произведений, поэтому порядок по score уже верный.
+    """
+    title = models.OneToOneField(
+        Title,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='trend',
+    )
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='title_trend_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.title_id}: {self.score}'
+
+
+class TrendEpoch(models.Model):
+    """Отметка времени, от которой отсчитываются оценки трендов."""
+    timestamp = models.FloatField()
+
+    def __str__(self):
+        return str(self.timestamp)
+
+
+class TopTitle(models.Model):
+    """Произведение в списке лучших жанра или категории.
+
+    В каждом списке не больше TOP_TITLES_SIZE произведений с отзывами
+    с наибольшим взвешенным рейтингом; rating — его копия для
+    сортировки без соединения с Title.
+    """
+    genre = models.ForeignKey(
+        Genre,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='top_titles',
+    )
+    category = models.ForeignKey(
+        Category,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='top_titles',
+    )
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    rating = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['genre', 'title'],
+                name='unique_genre_top_title',
+            ),
+            models.UniqueConstraint(
+                fields=['category', 'title'],
+                name='unique_category_top_title',
+            ),
+            models.CheckConstraint(
+                check=(
+                    models.Q(genre__isnull=True, category__isnull=False)
+                    | models.Q(genre__isnull=False, category__isnull=True)
+                ),
+                name='top_title_single_group',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.genre_id or self.category_id}: {self.title_id}'
+
+
+class TableVersion(models.Model):
+    """Версия таблицы, растущая при каждом ее изменении."""
+    table = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f'{self.table}: {self.version}'
@@ -0,0 +1,144 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Title
+
+# Таблица FTS5 создается миграцией 0011_title_search.
+FTS_TABLE = 'reviews_title_fts'
+# Вес совпадения в названии относительно совпадения в описании.
+NAME_WEIGHT = 10.0
+WORD_RE = re.compile(r'\w+')
+
+
+def search_words(query):
+    """Слова поискового запроса без знаков препинания и регистра."""
+    return WORD_RE.findall(query.casefold())
+
+
+class BaseSearchBackend:
+    """Интерфейс поиска по названию и описанию произведений.
+
+    Индекс обновляется из сигналов моделей и пересчитывается целиком
+    после пакетной загрузки. search() сужает queryset до найденных
+    произведений и упорядочивает их по релевантности.
+    """
+
+    def index(self, title):
+        """Добавление или обновление произведения в индексе."""
+
+    def remove(self, title_ids):
+        """Удаление произведений из индекса."""
+
+    def rebuild(self):
+        """Пересчет индекса по таблице произведений."""
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Поиск без индекса: каждое слово — префикс слова в тексте.
+
+    Для баз без полнотекстового поиска; каждый запрос просматривает
+    всю таблицу.
+    """
+
+    def search(self, queryset, query):
+        words = search_words(query)
+        if not words:
+            return queryset.none()
+        for word in words:
+            queryset = queryset.filter(
+                Q(name__iregex=rf'(^|\W){re.escape(word)}')
+                | Q(description__iregex=rf'(^|\W){re.escape(word)}')
+            )
+        return queryset.order_by('id')
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """Поиск по индексу SQLite FTS5 с ранжированием bm25.
+
+    Токенизатор unicode61 приводит к нижнему регистру и кириллицу,
+    и букву «ё». Каждое слово запроса ищется как префикс, поэтому
+    результаты есть уже по первым буквам.
+    """
+
+    def index(self, title):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [title.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description) '
+                'VALUES (%s, %s, %s)',
+                [title.pk, title.name, title.description or ''],
+            )
+
+    def remove(self, title_ids):
+        title_ids = list(title_ids)
+        if not title_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(title_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                title_ids,
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description) '
+                f'SELECT id, name, COALESCE(description, \'\') '
+                f'FROM {Title._meta.db_table}'
+            )
+            # Слияние сегментов индекса после массовой вставки.
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+            )
+
+    def search(self, queryset, query):
+        words = search_words(query)
+        if not words:
+            return queryset.none()
+        # Слова в кавычках не разбираются как синтаксис FTS5,
+        # * после кавычек — поиск по префиксу.
+        match = ' '.join(f'"{word}"*' for word in words)
+        title_table = Title._meta.db_table
+        found = RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match,),
+        )
+        # Ранг считается только для найденных строк: поиск по rowid
+        # в FTS-таблице — обращение по ключу.
+        rank = RawSQL(
+            f'SELECT bm25({FTS_TABLE}, {NAME_WEIGHT}, 1.0) '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'AND {FTS_TABLE}.rowid = "{title_table}"."id"',
+            (match,),
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=found).annotate(
+            search_rank=rank
+        ).order_by('search_rank', 'id')
+
+
+@lru_cache(maxsize=None)
+def search_backend():
+    """Поисковый движок из настройки TITLE_SEARCH_BACKEND.
+
+    По умолчанию FTS5 для SQLite и поиск без индекса для других баз.
+    """
+    path = getattr(settings, 'TITLE_SEARCH_BACKEND', None)
+    if path is None:
+        if connection.vendor == 'sqlite':
+            return SQLiteSearchBackend()
+        return SimpleSearchBackend()
+    return import_string(path)()
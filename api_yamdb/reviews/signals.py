@@ -0,0 +1,228 @@
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from users.models import User
+
+from .models import (RATING_MIN_VOTES, RATING_PRIOR_MEAN, Category, Comment,
+                     Genre, Review, Title, TitleGenre, TitleTrend, TopTitle,
+                     deleting_titles)
+from .search import search_backend
+from .stats import (STATS_MODELS, rebuild_stats, shift_genre_links,
+                    shift_stats, shift_title_stats, stats_changes,
+                    title_changes, title_histogram)
+from .suggest import suggest_index
+from .top import refresh_top, update_top
+from .trending import add_review_activity
+from .versions import bump_versions
+
+VERSIONED_MODELS = (Category, Genre, Title, Comment)
+
+
+def shift_rating(title_id, score_delta, count_delta):
+    """Сдвиг счетчиков и рейтингов произведения одним UPDATE."""
+    new_sum = Cast(F('score_sum') + score_delta, FloatField())
+    new_count = Cast(F('review_count') + count_delta, FloatField())
+    Title.objects.filter(pk=title_id).update(
+        score_sum=F('score_sum') + score_delta,
+        review_count=F('review_count') + count_delta,
+        rating=Case(
+            When(review_count__gt=-count_delta, then=new_sum / new_count),
+            default=Value(None),
+            output_field=FloatField(),
+        ),
+        weighted_rating=(
+            (new_sum + RATING_MIN_VOTES * RATING_PRIOR_MEAN)
+            / (new_count + RATING_MIN_VOTES)
+        ),
+    )
+
+
+def bump_table_version(sender, **kwargs):
+    bump_versions(sender)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_table_version, sender=model)
+    # Версию комментариев при удалении меняет сама модель и сигналы
+    # удаления отзывов и пользователей: обработчик на Comment отключил
+    # бы быстрое каскадное удаление.
+    if model is not Comment:
+        post_delete.connect(bump_table_version, sender=model)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # Новый пользователь не меняет уже выданные отзывы и комментарии.
+    if not created:
+        bump_versions(User)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # Комментарии пользователя удалены каскадом без сигналов.
+    bump_versions(User, Comment)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+def group_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        STATS_MODELS[sender][0].objects.create(pk=instance.pk)
+
+
+@receiver(post_save, sender=Title)
+def title_saved(sender, instance, created, raw, update_fields, **kwargs):
+    if raw:
+        return
+    if update_fields is None or {'name', 'description'} & update_fields:
+        search_backend().index(instance)
+        transaction.on_commit(
+            lambda: suggest_index.set_title(instance.pk, instance.name)
+        )
+    if created:
+        # Строка тренда заводится сразу: первый отзыв обойдется одним
+        # UPDATE, как и остальные.
+        TitleTrend.objects.create(title=instance)
+        if instance.category_id is not None:
+            shift_stats(
+                stats_changes(titles=1), categories=[instance.category_id]
+            )
+    elif hasattr(instance, '_loaded_category_id'):
+        old_category = instance._loaded_category_id
+        if old_category != instance.category_id:
+            histogram = title_histogram(instance.pk)
+            if old_category is not None:
+                shift_stats(
+                    title_changes(instance.pk, -1, histogram),
+                    categories=[old_category],
+                )
+            if instance.category_id is not None:
+                shift_stats(
+                    title_changes(instance.pk, 1, histogram),
+                    categories=[instance.category_id],
+                )
+            update_top(instance.pk)
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(pre_delete, sender=Title)
+def title_deleting(sender, instance, using, **kwargs):
+    deleting_titles(using).add(instance.pk)
+    shift_title_stats(instance.pk, title_changes(instance.pk, -1))
+    instance._top_groups = list(
+        TopTitle.objects.filter(title=instance).values_list(
+            'genre', 'category'
+        )
+    )
+
+
+@receiver(post_delete, sender=Title)
+def title_deleted(sender, instance, using, **kwargs):
+    deleting_titles(using).discard(instance.pk)
+    search_backend().remove([instance.pk])
+    title_id = instance.pk
+    transaction.on_commit(lambda: suggest_index.remove(title_id))
+    # Записи произведения удалены каскадом, освободившиеся места
+    # в списках лучших занимают следующие произведения.
+    top_groups = instance.__dict__.pop('_top_groups', ())
+    refresh_top('genre', [genre for genre, _ in top_groups if genre])
+    refresh_top('category', [
+        category for _, category in top_groups if category
+    ])
+
+
+def genre_links(instance, reverse, pk_set):
+    """Существующие связи (произведение, жанр) из m2m_changed."""
+    if reverse:
+        links = TitleGenre.objects.filter(genre=instance, title__in=pk_set)
+    else:
+        links = TitleGenre.objects.filter(title=instance, genre__in=pk_set)
+    return list(links.values_list('title_id', 'genre_id'))
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def title_genres_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_versions(Title, TitleGenre)
+    if action == 'pre_clear':
+        instance._removed_genre_links = list(TitleGenre.objects.filter(
+            **{'genre' if reverse else 'title': instance}
+        ).values_list('title_id', 'genre_id'))
+        return
+    if action == 'pre_remove':
+        instance._removed_genre_links = genre_links(
+            instance, reverse, pk_set
+        )
+        return
+    if action == 'post_add':
+        links = genre_links(instance, reverse, pk_set)
+        shift_genre_links(links, 1)
+    elif action in ('post_remove', 'post_clear'):
+        links = instance.__dict__.pop('_removed_genre_links', ())
+        shift_genre_links(links, -1)
+    else:
+        return
+    for title_id in {title_id for title_id, _ in links}:
+        update_top(title_id)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw, **kwargs):
+    # Рейтинг хранится в Title, поэтому версия произведений
+    # меняется вместе с отзывами.
+    bump_versions(Review, Title)
+    if raw:
+        return
+    if created:
+        shift_rating(instance.title_id, instance.score, 1)
+        add_review_activity(instance.title_id, instance.pub_date)
+        # Строки сводок групп общие для многих произведений, поэтому
+        # они правятся ближе к концу транзакции.
+        shift_title_stats(
+            instance.title_id, stats_changes(histogram={instance.score: 1})
+        )
+        update_top(instance.title_id)
+        transaction.on_commit(
+            lambda: suggest_index.shift_reviews(instance.title_id, 1)
+        )
+    else:
+        old_score = getattr(instance, '_loaded_score', None)
+        if old_score is None:
+            Title.objects.filter(
+                pk=instance.title_id
+            ).recount_ratings()
+            rebuild_stats(Genre.objects.filter(title=instance.title_id))
+            rebuild_stats(Category.objects.filter(titles=instance.title_id))
+            update_top(instance.title_id)
+        elif old_score != instance.score:
+            delta = instance.score - old_score
+            shift_rating(instance.title_id, delta, 0)
+            shift_title_stats(instance.title_id, stats_changes(
+                histogram={old_score: -1, instance.score: 1}
+            ))
+            update_top(instance.title_id)
+    instance._loaded_score = instance.score
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, using, **kwargs):
+    # Комментарии отзыва удалены каскадом без сигналов.
+    bump_versions(Review, Title, Comment)
+    score = getattr(instance, '_loaded_score', None)
+    if score is None:
+        score = instance.score
+    if instance.title_id not in deleting_titles(using):
+        shift_rating(instance.title_id, -score, -1)
+        add_review_activity(instance.title_id, instance.pub_date, -1)
+        shift_title_stats(
+            instance.title_id, stats_changes(histogram={score: -1})
+        )
+        update_top(instance.title_id)
+        transaction.on_commit(
+            lambda: suggest_index.shift_reviews(instance.title_id, -1)
+        )
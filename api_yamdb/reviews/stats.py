@@ -0,0 +1,138 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import (SCORES, Category, CategoryStats, Genre, GenreStats,
+                     Review, Title, TitleGenre)
+
+# Модель сводки и путь от группы к ее произведениям.
+STATS_MODELS = {
+    Genre: (GenreStats, 'title'),
+    Category: (CategoryStats, 'titles'),
+}
+
+
+def title_histogram(title_id):
+    """Гистограмма оценок отзывов произведения: {оценка: количество}."""
+    return dict(
+        Review.objects.filter(title_id=title_id)
+        .order_by()
+        .values_list('score')
+        .annotate(Count('id'))
+    )
+
+
+def stats_changes(titles=0, histogram=None):
+    """Аргументы UPDATE, сдвигающие сводку на разницу.
+
+    histogram — изменение количества отзывов по оценкам,
+    отрицательные значения уменьшают сводку.
+    """
+    histogram = histogram or {}
+    changes = {
+        'title_count': F('title_count') + titles,
+        'review_count': F('review_count') + sum(histogram.values()),
+        'score_sum': F('score_sum') + sum(
+            score * count for score, count in histogram.items()
+        ),
+    }
+    for score, count in histogram.items():
+        changes[f'score_{score}'] = F(f'score_{score}') + count
+    return changes
+
+
+def title_changes(title_id, sign=1, histogram=None):
+    """Вклад произведения целиком: само произведение и его отзывы."""
+    if histogram is None:
+        histogram = title_histogram(title_id)
+    return stats_changes(sign, {
+        score: sign * count for score, count in histogram.items()
+    })
+
+
+def shift_stats(changes, genres=None, categories=None):
+    """Сдвиг сводок жанров и категорий одним UPDATE на таблицу.
+
+    genres и categories — списки id или подзапросы, возвращающие id.
+    """
+    if genres is not None:
+        GenreStats.objects.filter(genre_id__in=genres).update(**changes)
+    if categories is not None:
+        CategoryStats.objects.filter(
+            category_id__in=categories
+        ).update(**changes)
+
+
+def shift_title_stats(title_id, changes):
+    """Сдвиг сводок всех жанров и категории произведения."""
+    shift_stats(
+        changes,
+        genres=TitleGenre.objects.filter(title_id=title_id).values('genre'),
+        categories=Title.objects.filter(pk=title_id).values('category'),
+    )
+
+
+def shift_genre_links(links, sign):
+    """Учет связей (произведение, жанр) в сводках жанров.
+
+    sign=1 — связи добавлены, sign=-1 — удалены.
+    """
+    genres = {}
+    for title_id, genre_id in links:
+        genres.setdefault(title_id, []).append(genre_id)
+    for title_id, genre_ids in genres.items():
+        shift_stats(title_changes(title_id, sign), genres=genre_ids)
+
+
+def count_stats(queryset):
+    """Сводки жанров или категорий из queryset, посчитанные заново.
+
+    Возвращает {id группы: значения полей сводки}, в базу не пишет.
+    """
+    _, titles = STATS_MODELS[queryset.model]
+    reviews = f'{titles}__reviews'
+    groups = queryset.order_by().annotate(
+        stats_titles=Count(titles, distinct=True),
+        stats_reviews=Count(reviews),
+        stats_score_sum=Coalesce(Sum(f'{reviews}__score'), 0),
+        **{
+            f'stats_score_{score}': Count(
+                reviews, filter=Q(**{f'{reviews}__score': score})
+            )
+            for score in SCORES
+        },
+    )
+    return {
+        group.pk: {
+            'title_count': group.stats_titles,
+            'review_count': group.stats_reviews,
+            'score_sum': group.stats_score_sum,
+            **{
+                f'score_{score}': getattr(group, f'stats_score_{score}')
+                for score in SCORES
+            },
+        }
+        for group in groups.iterator()
+    }
+
+
+def rebuild_stats(queryset):
+    """Полный пересчет сводок жанров или категорий из queryset.
+
+    Нужен после пакетной загрузки, которая не отправляет сигналы.
+    Возвращает список пересчитанных сводок.
+    """
+    stats_model, _ = STATS_MODELS[queryset.model]
+    stats = [
+        stats_model(pk=pk, **values)
+        for pk, values in count_stats(queryset).items()
+    ]
+    with transaction.atomic():
+        stats_model.objects.filter(pk__in=queryset.values('pk')).delete()
+        stats_model.objects.bulk_create(stats, batch_size=500)
+    return stats
+
+
+def rebuild_all_stats():
+    for model in STATS_MODELS:
+        rebuild_stats(model.objects.all())
@@ -0,0 +1,239 @@
+import heapq
+import logging
+import os
+import re
+import threading
+from bisect import bisect_left, insort
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Title
+
+SUGGEST_SIZE = getattr(settings, 'TITLE_SUGGEST_SIZE', 10)
+SUGGEST_INDEX_TTL = getattr(settings, 'TITLE_SUGGEST_INDEX_TTL', 300)
+# Строить и обновлять индекс фоновым потоком. Без него индекс
+# строится только явным вызовом refresh (например, в тестах).
+SUGGEST_BACKGROUND = getattr(settings, 'TITLE_SUGGEST_BACKGROUND', True)
+# Если под префикс попадает больше ключей, подсказки сначала ищутся
+# обходом произведений по убыванию количества отзывов: при таком числе
+# совпадений нужные обычно находятся в начале списка. Обход ограничен
+# POPULAR_SCAN_LIMIT произведениями и пропускается, если при такой доле
+# совпадений в него не уложиться: тогда, как и при непопулярных
+# совпадениях, подсказки выбираются из диапазона ключей.
+SCAN_LIMIT = 512
+POPULAR_SCAN_LIMIT = 1024
+# Символ больше любого другого: граница диапазона ключей с префиксом.
+MAX_CHAR = chr(0x10FFFF)
+WORD_RE = re.compile(r'\w+')
+
+logger = logging.getLogger(__name__)
+
+
+def fold(text):
+    """Нормализация для поиска: регистр, «ё» и лишние пробелы."""
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def name_keys(name):
+    """Ключи индекса: название целиком и его окончания с начала слов.
+
+    Так «оре» находит «Крепкий орешек».
+    """
+    folded = fold(name)
+    return {folded[match.start():] for match in WORD_RE.finditer(folded)}
+
+
+class SuggestIndex:
+    """Префиксный индекс названий произведений в памяти процесса.
+
+    Ключи хранятся в отсортированном списке, поиск по префиксу — два
+    двоичных поиска. Индекс строит и раз в ttl секунд перечитывает
+    фоновый поток (см. start), запросы пользователей только читают
+    его. Изменения из сигналов этого процесса применяются сразу после
+    коммита, изменения из других процессов — при следующем чтении.
+    """
+
+    def __init__(self, ttl=SUGGEST_INDEX_TTL, background=SUGGEST_BACKGROUND):
+        self.ttl = ttl
+        self.background = background
+        self._keys = []
+        # {id произведения: [название, количество отзывов, ключи]}
+        self._titles = {}
+        # (-количество отзывов, id) по возрастанию.
+        self._popular = []
+        self._loaded = False
+        # Названия, измененные во время чтения индекса из базы.
+        self._changed = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._refresher = None
+        # Процесс, в котором запущен фоновый поток.
+        self._pid = None
+
+    def refresh(self):
+        """Перечитать индекс из базы.
+
+        База читается без блокировки, подсказки тем временем отдаются
+        из прежнего индекса. Названия, измененные за время чтения,
+        применяются к новому индексу повторно.
+        """
+        with self._lock:
+            self._changed = {}
+        try:
+            titles = {}
+            keys = []
+            for title_id, name, review_count in Title.objects.order_by(
+            ).values_list('id', 'name', 'review_count').iterator():
+                title_keys = name_keys(name)
+                titles[title_id] = [name, review_count, title_keys]
+                keys.extend((key, title_id) for key in title_keys)
+            keys.sort()
+            popular = sorted(
+                (-review_count, title_id)
+                for title_id, (_, review_count, _) in titles.items()
+            )
+        except BaseException:
+            with self._lock:
+                self._changed = None
+            raise
+        with self._lock:
+            changed, self._changed = self._changed, None
+            self._titles, self._keys, self._popular = titles, keys, popular
+            self._loaded = True
+            for title_id, name in changed.items():
+                if name is None:
+                    self._remove(title_id)
+                else:
+                    self._set_title(title_id, name)
+
+    def start(self):
+        """Запуск фонового потока, который строит и обновляет индекс.
+
+        Поток запускается один раз в каждом процессе: suggest вызывает
+        start сам, поэтому процессы, созданные fork после загрузки
+        приложения (uWSGI, gunicorn --preload), получают свой поток.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._refresher = threading.Thread(
+                target=self._refresh_forever, name='suggest-index',
+                daemon=True,
+            )
+        self._refresher.start()
+
+    def _after_fork(self):
+        # Потоки не переживают fork, а блокировку в момент fork мог
+        # держать фоновый поток родителя.
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._refresher = None
+        self._pid = None
+
+    def _refresh_forever(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('Не удалось перечитать индекс подсказок.')
+            finally:
+                connection.close()
+            self._wakeup.wait(self.ttl)
+            self._wakeup.clear()
+
+    def _remove_entry(self, title_id):
+        name, review_count, keys = self._titles.pop(title_id)
+        for key in keys:
+            del self._keys[bisect_left(self._keys, (key, title_id))]
+        popular = self._popular
+        del popular[bisect_left(popular, (-review_count, title_id))]
+        return review_count
+
+    def _matches(self, prefix, limit):
+        lo = bisect_left(self._keys, (prefix,))
+        hi = bisect_left(self._keys, (prefix + MAX_CHAR,))
+        if hi - lo > SCAN_LIMIT and (
+            limit * len(self._titles) <= POPULAR_SCAN_LIMIT * (hi - lo)
+        ):
+            found = []
+            for _, title_id in islice(self._popular, POPULAR_SCAN_LIMIT):
+                if any(
+                    key.startswith(prefix)
+                    for key in self._titles[title_id][2]
+                ):
+                    found.append(title_id)
+                    if len(found) == limit:
+                        return found
+        title_ids = {title_id for _, title_id in self._keys[lo:hi]}
+        return heapq.nsmallest(
+            limit, title_ids,
+            key=lambda title_id: (-self._titles[title_id][1], title_id),
+        )
+
+    def suggest(self, query, limit=SUGGEST_SIZE):
+        """До limit произведений с префиксом query по убыванию отзывов.
+
+        Возвращает список (id, название, количество отзывов). Пока
+        индекс не построен, подсказок нет.
+        """
+        if self.background and self._pid != os.getpid():
+            self.start()
+        prefix = fold(query)
+        if not prefix:
+            return []
+        with self._lock:
+            return [
+                (title_id, *self._titles[title_id][:2])
+                for title_id in self._matches(prefix, limit)
+            ]
+
+    def _set_title(self, title_id, name):
+        review_count = 0
+        if title_id in self._titles:
+            review_count = self._remove_entry(title_id)
+        keys = name_keys(name)
+        self._titles[title_id] = [name, review_count, keys]
+        for key in keys:
+            insort(self._keys, (key, title_id))
+        insort(self._popular, (-review_count, title_id))
+
+    def _remove(self, title_id):
+        if title_id in self._titles:
+            self._remove_entry(title_id)
+
+    def set_title(self, title_id, name):
+        """Добавление произведения или смена его названия."""
+        with self._lock:
+            if self._changed is not None:
+                self._changed[title_id] = name
+            if self._loaded:
+                self._set_title(title_id, name)
+
+    def shift_reviews(self, title_id, delta):
+        """Сдвиг количества отзывов произведения."""
+        with self._lock:
+            entry = self._titles.get(title_id)
+            if entry is None:
+                return
+            popular = self._popular
+            del popular[bisect_left(popular, (-entry[1], title_id))]
+            entry[1] = max(entry[1] + delta, 0)
+            insort(popular, (-entry[1], title_id))
+
+    def remove(self, title_id):
+        with self._lock:
+            if self._changed is not None:
+                self._changed[title_id] = None
+            self._remove(title_id)
+
+    def invalidate(self):
+        """Перечитать индекс в фоновом потоке, не дожидаясь срока."""
+        self._wakeup.set()
+
+
+suggest_index = SuggestIndex()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=suggest_index._after_fork)
@@ -0,0 +1,251 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from reviews.bulk import batches, keep_auto_dates, reset_sequences
+from reviews.models import (Category, Comment, Genre, Review, Title,
+                            TitleGenre, User)
+from reviews.search import search_backend
+from reviews.stats import rebuild_all_stats
+from reviews.suggest import suggest_index
+from reviews.top import rebuild_top
+from reviews.trending import rebuild_trends
+from reviews.versions import bump_versions
+
+BATCH_SIZE = 1000
+# За сколько дней до текущего момента разбросаны даты публикаций.
+DATE_SPREAD_DAYS = 365
+MAX_TITLE_GENRES = 3
+# Показатель закона Ципфа для популярности произведений.
+ZIPF_EXPONENT = 1.0
+# Средняя оценка произведений и разброс оценок вокруг нее.
+MEAN_SCORE = 7.0
+QUALITY_SPREAD = 1.5
+SCORE_SPREAD = 1.8
+WORDS = (
+    'сюжет', 'герой', 'финал', 'автор', 'актер', 'музыка', 'сцена',
+    'роман', 'глава', 'образ', 'стиль', 'жанр', 'драма', 'смысл',
+    'отличный', 'скучный', 'яркий', 'слабый', 'неожиданный', 'долгий',
+    'очень', 'совсем', 'слишком', 'местами', 'наконец', 'снова',
+)
+
+
+class SyntheticDataset:
+    """Генератор синтетических строк для бенчмарков и профилирования.
+
+    При одинаковых seed и now генерируются одинаковые строки.
+    Строки получают явные id после максимальных в таблицах, поэтому
+    набор можно догенерировать и в непустую базу. Новые отзывы и
+    комментарии ссылаются только на сгенерированные здесь же строки.
+
+    report, если задан, вызывается после каждой таблицы с моделью,
+    количеством строк и временем вставки в секундах.
+    """
+
+    def __init__(self, seed=0, batch_size=BATCH_SIZE, now=None,
+                 zipf_exponent=ZIPF_EXPONENT, report=None):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.now = now or timezone.now()
+        self.zipf_exponent = zipf_exponent
+        self.report = report
+
+    def insert(self, model, objects):
+        """Пакетная вставка в одной транзакции, как в load_csv."""
+        first = (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        count = 0
+        started = time.monotonic()
+        with transaction.atomic(), keep_auto_dates(model):
+            for batch in batches(objects(first), self.batch_size):
+                model.objects.bulk_create(batch)
+                count += len(batch)
+        if self.report is not None:
+            self.report(model, count, time.monotonic() - started)
+        return range(first, first + count)
+
+    def text(self, min_words=5, max_words=30):
+        words = self.random.choices(
+            WORDS, k=self.random.randint(min_words, max_words)
+        )
+        return ' '.join(words).capitalize() + '.'
+
+    def pub_date(self):
+        seconds = self.random.randrange(DATE_SPREAD_DAYS * 24 * 60 * 60)
+        return self.now - timedelta(seconds=seconds)
+
+    def users(self, count):
+        return self.insert(User, lambda first: (
+            User(
+                id=pk,
+                username=f'synthetic{pk}',
+                email=f'synthetic{pk}@example.com',
+                password=UNUSABLE_PASSWORD_PREFIX,
+            )
+            for pk in range(first, first + count)
+        ))
+
+    def categories(self, count):
+        return self.insert(Category, lambda first: (
+            Category(id=pk, name=f'Категория {pk}', slug=f'category-{pk}')
+            for pk in range(first, first + count)
+        ))
+
+    def genres(self, count):
+        return self.insert(Genre, lambda first: (
+            Genre(id=pk, name=f'Жанр {pk}', slug=f'genre-{pk}')
+            for pk in range(first, first + count)
+        ))
+
+    def titles(self, count, categories):
+        return self.insert(Title, lambda first: (
+            Title(
+                id=pk,
+                name=f'Произведение {pk}',
+                year=self.random.randint(1900, self.now.year),
+                description=self.text(max_words=15),
+                category_id=self.random.choice(categories),
+            )
+            for pk in range(first, first + count)
+        ))
+
+    def title_genres(self, titles, genres):
+        size = min(MAX_TITLE_GENRES, len(genres))
+        return self.insert(TitleGenre, lambda first: (
+            TitleGenre(id=pk, title_id=title_id, genre_id=genre_id)
+            for pk, (title_id, genre_id) in enumerate((
+                (title_id, genre_id)
+                for title_id in titles
+                for genre_id in self.random.sample(
+                    genres, self.random.randint(1, size)
+                )
+            ), start=first)
+        ))
+
+    def review_counts(self, total, titles, users):
+        """Количество отзывов на каждое произведение.
+
+        Популярность распределена по закону Ципфа: произведение
+        ранга r получает долю отзывов, пропорциональную 1 / r ** s.
+        Один пользователь оставляет не больше одного отзыва
+        на произведение, поэтому отзывов на произведение не больше,
+        чем пользователей; излишек достается следующим по рангу.
+        Ранги перемешаны, чтобы популярность не зависела от id.
+        """
+        limit = len(users)
+        if total > len(titles) * limit:
+            raise ValueError(
+                f'{total} отзывов не уместить в {len(titles)} произведений '
+                f'при {limit} пользователях.'
+            )
+        weights = [
+            1 / rank ** self.zipf_exponent
+            for rank in range(1, len(titles) + 1)
+        ]
+        counts = [0] * len(titles)
+        remaining = total
+        while remaining:
+            active = [
+                index for index, count in enumerate(counts) if count < limit
+            ]
+            weight_sum = sum(weights[index] for index in active)
+            shares = {
+                index: min(
+                    int(remaining * weights[index] / weight_sum),
+                    limit - counts[index],
+                )
+                for index in active
+            }
+            leftover = remaining - sum(shares.values())
+            for index in active:
+                if leftover and shares[index] < limit - counts[index]:
+                    shares[index] += 1
+                    leftover -= 1
+                counts[index] += shares[index]
+            remaining = leftover
+        self.random.shuffle(counts)
+        return counts
+
+    def score(self, quality):
+        """Оценка вокруг средней оценки произведения, от 1 до 10."""
+        score = round(self.random.gauss(quality, SCORE_SPREAD))
+        return min(max(score, 1), 10)
+
+    def reviews(self, count, titles, users):
+        counts = self.review_counts(count, titles, users)
+
+        def rows():
+            for title_id, title_count in zip(titles, counts):
+                quality = self.random.gauss(MEAN_SCORE, QUALITY_SPREAD)
+                for author_id in self.random.sample(users, title_count):
+                    yield title_id, author_id, self.score(quality)
+
+        return self.insert(Review, lambda first: (
+            Review(
+                id=pk,
+                title_id=title_id,
+                author_id=author_id,
+                score=score,
+                text=self.text(),
+                pub_date=self.pub_date(),
+            )
+            for pk, (title_id, author_id, score) in enumerate(
+                rows(), start=first
+            )
+        ))
+
+    def comments(self, count, reviews, users):
+        # Отзыв выбирается равномерно, поэтому комментарии
+        # распределены по произведениям так же, как отзывы.
+        return self.insert(Comment, lambda first: (
+            Comment(
+                id=pk,
+                review_id=self.random.choice(reviews),
+                author_id=self.random.choice(users),
+                text=self.text(max_words=15),
+                pub_date=self.pub_date(),
+            )
+            for pk in range(first, first + count)
+        ))
+
+    def generate(self, users, categories, genres, titles, reviews,
+                 comments):
+        """Генерация полного набора; возвращает число строк по таблицам."""
+        if not all((users, categories, genres, titles)):
+            raise ValueError(
+                'Нужен хотя бы один пользователь, категория, жанр '
+                'и произведение.'
+            )
+        if comments and not reviews:
+            raise ValueError('Комментариям нужны отзывы.')
+        user_ids = self.users(users)
+        category_ids = self.categories(categories)
+        genre_ids = self.genres(genres)
+        title_ids = self.titles(titles, category_ids)
+        title_genre_ids = self.title_genres(title_ids, genre_ids)
+        review_ids = self.reviews(reviews, title_ids, user_ids)
+        comment_ids = self.comments(comments, review_ids, user_ids)
+        created = {
+            User: user_ids,
+            Category: category_ids,
+            Genre: genre_ids,
+            Title: title_ids,
+            TitleGenre: title_genre_ids,
+            Review: review_ids,
+            Comment: comment_ids,
+        }
+        reset_sequences(created)
+        # bulk_create не отправляет сигналы: счетчики рейтинга, сводки,
+        # списки лучших, тренды и версии таблиц обновляем после вставки.
+        Title.objects.filter(pk__gte=title_ids.start).recount_ratings()
+        rebuild_all_stats()
+        rebuild_top()
+        search_backend().rebuild()
+        suggest_index.invalidate()
+        rebuild_trends(now=self.now.timestamp())
+        bump_versions(*created)
+        return {model.__name__: len(ids) for model, ids in created.items()}
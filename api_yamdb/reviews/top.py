@@ -0,0 +1,213 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import IntegerField, Q, Value
+
+from .models import (Category, CategoryStats, Genre, GenreStats, Title,
+                     TopTitle)
+
+TOP_SIZE = getattr(settings, 'TOP_TITLES_SIZE', 10)
+GROUP_MODELS = {'genre': Genre, 'category': Category}
+# Строки сводок групп служат блокировками их списков лучших.
+LOCK_MODELS = {'genre': GenreStats, 'category': CategoryStats}
+
+
+def rank(title_id, rating):
+    """Ключ сортировки списка: рейтинг по убыванию, затем id."""
+    return -rating, title_id
+
+
+def lock_groups(groups):
+    """Блокировка списков групп до конца транзакции.
+
+    Правка списка — чтение, решение и запись, поэтому параллельные
+    отзывы к произведениям одной группы могли бы раздуть список или
+    нарушить уникальность. Строки сводок блокируются по возрастанию
+    id, чтобы транзакции не ждали друг друга по кругу. SQLite пишет
+    транзакции по одной, там блокировка не нужна. Возвращает True,
+    если строки заблокированы.
+    """
+    if not connection.features.has_select_for_update:
+        return False
+    for field, model in LOCK_MODELS.items():
+        group_ids = sorted({
+            group_id for group_field, group_id in groups
+            if group_field == field
+        })
+        if group_ids:
+            list(model.objects.select_for_update().filter(
+                pk__in=group_ids
+            ).order_by('pk').values_list('pk', flat=True))
+    return True
+
+
+@transaction.atomic(savepoint=False)
+def refresh_lists(field, group_ids):
+    lock_groups((field, group_id) for group_id in group_ids)
+    for group_id in group_ids:
+        titles = Title.objects.filter(
+            **{field: group_id}, review_count__gt=0
+        ).order_by('-weighted_rating', 'id').values_list(
+            'id', 'weighted_rating'
+        )[:TOP_SIZE]
+        TopTitle.objects.filter(**{field: group_id}).delete()
+        TopTitle.objects.bulk_create(
+            TopTitle(**{field + '_id': group_id}, title_id=pk, rating=rating)
+            for pk, rating in titles
+        )
+
+
+def refresh_top(field, group_ids):
+    """Пересчет списков лучших для групп: field — 'genre' или 'category'.
+
+    Каждый список — один запрос к Title по индексу взвешенного рейтинга.
+    """
+    group_ids = list(group_ids)
+    if group_ids:
+        refresh_lists(field, group_ids)
+
+
+def rebuild_top():
+    """Полный пересчет всех списков, например после пакетной загрузки."""
+    for field, model in GROUP_MODELS.items():
+        refresh_top(field, model.objects.values_list('pk', flat=True))
+
+
+def list_entries(title_id, genres, categories):
+    """Записи списков групп и списков, где уже есть произведение.
+
+    Поля идут в порядке genre, category, title, rating, id.
+    """
+    # Списки, из которых произведение выбывает, тоже нужны целиком:
+    # от их заполненности зависит, нужен ли пересчет.
+    own = TopTitle.objects.filter(title_id=title_id)
+    return TopTitle.objects.filter(
+        Q(genre__in=genres)
+        | Q(category__in=categories)
+        | Q(genre__in=own.filter(genre__isnull=False).values('genre'))
+        | Q(category__in=own.filter(
+            category__isnull=False
+        ).values('category'))
+    ).order_by().values_list('genre', 'category', 'title', 'rating', 'id')
+
+
+def group_lists(entries):
+    """{(поле, id группы): {id произведения: (id записи, рейтинг)}}."""
+    lists = {}
+    for genre_id, category_id, title_id, rating, pk in entries:
+        if genre_id is not None:
+            group = ('genre', genre_id)
+        else:
+            group = ('category', category_id)
+        lists.setdefault(group, {})[title_id] = (pk, rating)
+    return lists
+
+
+def title_groups(title_id):
+    """Взвешенный рейтинг, количество отзывов, группы и списки произведения.
+
+    Все читается одним запросом: строки произведения, по одной на жанр,
+    добавляются к записям списков через UNION ALL с пустым id записи.
+    Значения читаются из базы после UPDATE счетчиков в той же
+    транзакции, поэтому не отстают от чужих отзывов.
+    """
+    title = Title.objects.filter(pk=title_id)
+    none = Value(None, output_field=IntegerField())
+    entries = list_entries(
+        title_id, title.values('genre'), title.values('category')
+    ).union(
+        # Выражение идет последним: поля модели попадают в SELECT
+        # раньше выражений.
+        title.order_by().values_list(
+            'genre', 'category', 'review_count', 'weighted_rating', none
+        ),
+        all=True,
+    )
+    rating, review_count, groups, rows = 0, 0, set(), []
+    for row in entries:
+        if row[4] is not None:
+            rows.append(row)
+            continue
+        genre_id, category_id, review_count, rating, _ = row
+        if genre_id is not None:
+            groups.add(('genre', genre_id))
+        if category_id is not None:
+            groups.add(('category', category_id))
+    return rating, review_count, groups, group_lists(rows)
+
+
+class ListChanges:
+    """Правки списков лучших, собранные для записи пачкой.
+
+    Все записи одного произведения получают один и тот же рейтинг,
+    поэтому правка любого числа списков — не больше трех запросов.
+    """
+
+    def __init__(self):
+        self.updated = []
+        self.deleted = []
+        self.created = []
+        self.refresh = {field: [] for field in GROUP_MODELS}
+
+    def save(self, rating):
+        if self.deleted:
+            TopTitle.objects.filter(pk__in=self.deleted).delete()
+        if self.updated:
+            TopTitle.objects.filter(pk__in=self.updated).update(rating=rating)
+        if self.created:
+            TopTitle.objects.bulk_create(self.created)
+        for field, group_ids in self.refresh.items():
+            refresh_top(field, group_ids)
+
+
+def update_list(changes, group, current, title_id, rating, eligible):
+    """Правка одного списка: решение записывается в changes."""
+    field, group_id = group
+    full = len(current) >= TOP_SIZE
+    if title_id in current:
+        pk, old_rating = current[title_id]
+        if full and (not eligible or rating < old_rating):
+            changes.refresh[field].append(group_id)
+        elif not eligible:
+            changes.deleted.append(pk)
+        elif rating != old_rating:
+            changes.updated.append(pk)
+        return
+    if not eligible:
+        return
+    if full:
+        worst_title, (worst_pk, worst_rating) = max(
+            current.items(), key=lambda item: rank(item[0], item[1][1])
+        )
+        if rank(title_id, rating) > rank(worst_title, worst_rating):
+            return
+        changes.deleted.append(worst_pk)
+    changes.created.append(TopTitle(
+        **{field + '_id': group_id}, title_id=title_id, rating=rating
+    ))
+
+
+@transaction.atomic(savepoint=False)
+def update_top(title_id):
+    """Учет изменения рейтинга, жанров или категории произведения.
+
+    Списки, в которые произведение попадает или остается в них,
+    правятся на месте. Полный пересчет нужен только для списков,
+    из которых оно выбывает: заранее неизвестно, кто займет место.
+    """
+    rating, review_count, groups, lists = title_groups(title_id)
+    # Блокировки берутся после чтения: группы произведения заранее
+    # неизвестны. Под блокировкой списки читаются заново.
+    if lock_groups(groups | set(lists)):
+        ids = {field: [] for field in GROUP_MODELS}
+        for field, group_id in groups:
+            ids[field].append(group_id)
+        lists = group_lists(
+            list_entries(title_id, ids['genre'], ids['category'])
+        )
+    changes = ListChanges()
+    for group in groups | set(lists):
+        eligible = group in groups and review_count > 0
+        update_list(
+            changes, group, lists.get(group, {}), title_id, rating, eligible
+        )
+    changes.save(rating)
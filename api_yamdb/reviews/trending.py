@@ -0,0 +1,148 @@
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, Value
+from django.db.models.functions import Greatest
+
+from .models import Review, TitleTrend, TrendEpoch
+
+# Период полураспада вклада отзыва в тренд, в секундах.
+HALF_LIFE = getattr(settings, 'TRENDING_HALF_LIFE', 3 * 24 * 60 * 60)
+DECAY_RATE = math.log(2) / HALF_LIFE
+# Отзывы старше стольких периодов полураспада дают меньше 1e-6
+# и при пересчете не учитываются.
+MAX_HALF_LIVES = 20
+# Строки с меньшей оценкой удаляются при нормализации.
+MIN_TREND_SCORE = 0.5 ** MAX_HALF_LIVES
+
+
+def locked_epoch():
+    """Текущая отметка отсчета; строка блокируется до конца транзакции.
+
+    Нужна только пересчетам по расписанию, запись отзывов обходится
+    без блокировки, см. add_review_activity.
+    """
+    epoch, _ = TrendEpoch.objects.select_for_update().get_or_create(
+        pk=1, defaults={'timestamp': time.time()}
+    )
+    return epoch
+
+
+def review_weight(pub_date, epoch):
+    return math.exp(DECAY_RATE * (pub_date.timestamp() - epoch))
+
+
+def decay_factor(epoch, now=None):
+    """Множитель, переводящий score в оценку на момент now."""
+    if now is None:
+        now = time.time()
+    return math.exp(-DECAY_RATE * (now - epoch))
+
+
+def current_epoch():
+    """Отметка отсчета без блокировки."""
+    timestamp = TrendEpoch.objects.filter(pk=1).values_list(
+        'timestamp', flat=True
+    ).first()
+    if timestamp is None:
+        timestamp = TrendEpoch.objects.get_or_create(
+            pk=1, defaults={'timestamp': time.time()}
+        )[0].timestamp
+    return timestamp
+
+
+# Отметка отсчета, с которой прошел последний UPDATE в этом процессе.
+# Устаревшую отметку отсекает сравнение в самом UPDATE, поэтому
+# обычно отзыв обходится без чтения TrendEpoch.
+_known_epoch = None
+
+
+def add_review_activity(title_id, pub_date, sign=1):
+    """Сдвиг оценки тренда на вклад одного отзыва.
+
+    sign=1 — отзыв добавлен, sign=-1 — удален. Отметка отсчета читается
+    без блокировки, а UPDATE выполняется, только если она не сменилась
+    (сравнение с обменом): иначе вклад пересчитывается от новой отметки.
+    Так запись отзывов не ждет друг друга и нормализации.
+    """
+    global _known_epoch
+    epoch = _known_epoch
+    if epoch is None:
+        epoch = current_epoch()
+    while True:
+        weight = sign * review_weight(pub_date, epoch)
+        updated = TitleTrend.objects.filter(
+            Exists(TrendEpoch.objects.filter(pk=1, timestamp=epoch)),
+            title_id=title_id,
+        ).update(score=Greatest(F('score') + weight, Value(0.0)))
+        if updated:
+            _known_epoch = epoch
+            return
+        fresh = current_epoch()
+        _known_epoch = fresh
+        if fresh != epoch:
+            epoch = fresh
+            continue
+        if sign < 0:
+            return
+        try:
+            with transaction.atomic():
+                TitleTrend.objects.create(title_id=title_id, score=weight)
+            return
+        except IntegrityError:
+            # Строку тренда только что создал параллельный запрос.
+            continue
+
+
+@transaction.atomic
+def renormalize_trends(now=None):
+    """Перенос отметки отсчета на now с пересчетом всех оценок.
+
+    Оценки растут экспоненциально от отметки, поэтому ее нужно
+    периодически сдвигать. Строки с пренебрежимо малой оценкой
+    удаляются. Возвращает количество оставшихся и удаленных строк.
+    """
+    if now is None:
+        now = time.time()
+    epoch = locked_epoch()
+    factor = decay_factor(epoch.timestamp, now)
+    kept = TitleTrend.objects.update(score=F('score') * factor)
+    removed, _ = TitleTrend.objects.filter(score__lt=MIN_TREND_SCORE).delete()
+    epoch.timestamp = now
+    epoch.save(update_fields=('timestamp',))
+    return kept - removed, removed
+
+
+@transaction.atomic
+def rebuild_trends(now=None):
+    """Полный пересчет оценок трендов по отзывам.
+
+    Нужен после пакетной загрузки, которая не отправляет сигналы.
+    Возвращает количество произведений с ненулевой оценкой.
+    """
+    if now is None:
+        now = time.time()
+    epoch = locked_epoch()
+    epoch.timestamp = now
+    epoch.save(update_fields=('timestamp',))
+    scores = defaultdict(float)
+    reviews = Review.objects.filter(
+        pub_date__gte=datetime.fromtimestamp(
+            now - HALF_LIFE * MAX_HALF_LIVES, timezone.utc
+        )
+    ).order_by().values_list('title_id', 'pub_date')
+    for title_id, pub_date in reviews.iterator():
+        scores[title_id] += review_weight(pub_date, now)
+    TitleTrend.objects.all().delete()
+    TitleTrend.objects.bulk_create(
+        (
+            TitleTrend(title_id=title_id, score=score)
+            for title_id, score in scores.items()
+        ),
+        batch_size=1000,
+    )
+    return len(scores)
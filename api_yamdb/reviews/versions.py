@@ -0,0 +1,152 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.db import transaction
+
+from users.cache import shared_cache
+
+from .models import TableVersion
+
+VERSION_CACHE = getattr(settings, 'TABLE_VERSION_CACHE', DEFAULT_CACHE_ALIAS)
+VERSION_CACHE_TIMEOUT = getattr(settings, 'TABLE_VERSION_CACHE_TIMEOUT', 60)
+
+_last_version = 0
+_version_lock = threading.Lock()
+
+
+def now_version():
+    """Отметка времени в микросекундах, строго растущая в процессе."""
+    global _last_version
+    with _version_lock:
+        _last_version = max(time.time_ns() // 1000, _last_version + 1)
+        return _last_version
+
+
+def version_key(label):
+    return f'table-version:{label}'
+
+
+def version_cache():
+    """Общий для процессов кэш версий; None — версии читаются из базы."""
+    return shared_cache(VERSION_CACHE)
+
+
+def get_versions(*models):
+    """Версии таблиц моделей: из кэша, а при промахе — из базы.
+
+    Версия — отметка времени в микросекундах, поэтому по ней же
+    можно судить о времени последнего изменения таблицы. Прочитанное
+    из базы кладется в кэш через add: если писатель успел записать
+    новую версию, старая ее не перетрет. Чтение ничего не пишет
+    в базу: у таблицы без строки версии она равна 0.
+    """
+    labels = [model._meta.label_lower for model in models]
+    cache = version_cache()
+    versions = {}
+    if cache is not None:
+        cached = cache.get_many([version_key(label) for label in labels])
+        versions = {
+            label: cached[version_key(label)]
+            for label in labels if version_key(label) in cached
+        }
+    missing = [label for label in labels if label not in versions]
+    if missing:
+        stored = dict(
+            TableVersion.objects.filter(
+                table__in=missing
+            ).values_list('table', 'version')
+        )
+        for label in missing:
+            versions[label] = stored.get(label, 0)
+            if cache is not None:
+                cache.add(
+                    version_key(label), versions[label],
+                    VERSION_CACHE_TIMEOUT,
+                )
+    return [versions[label] for label in labels]
+
+
+def get_version(model):
+    return get_versions(model)[0]
+
+
+def write_version(label):
+    """Новая версия таблицы в базе и в кэше.
+
+    Версия в базе только растет: если в ней уже есть большая (часы
+    другого процесса спешат), берется следующая за ней.
+    """
+    version = now_version()
+    while True:
+        if TableVersion.objects.filter(
+            table=label, version__lt=version
+        ).update(version=version):
+            break
+        current = TableVersion.objects.filter(table=label).values_list(
+            'version', flat=True
+        ).first()
+        if current is None:
+            _, created = TableVersion.objects.get_or_create(
+                table=label, defaults={'version': version}
+            )
+            if created:
+                break
+        else:
+            version = current + 1
+    cache_version(label, version)
+
+
+def cache_version(label, version):
+    cache = version_cache()
+    if cache is not None and (cache.get(version_key(label)) or 0) < version:
+        cache.set(version_key(label), version, VERSION_CACHE_TIMEOUT)
+
+
+def write_versions(labels):
+    """Новая версия нескольких таблиц, обычно одним UPDATE.
+
+    Если какой-то строки нет или в ней версия больше, все таблицы
+    проходят через write_version.
+    """
+    labels = sorted(labels)
+    version = now_version()
+    if TableVersion.objects.filter(
+        table__in=labels, version__lt=version
+    ).update(version=version) == len(labels):
+        for label in labels:
+            cache_version(label, version)
+        return
+    for label in labels:
+        write_version(label)
+
+
+def write_pending_versions(connection):
+    """Записать версии, накопленные в соединении, и очистить набор."""
+    labels = connection.pending_versions
+    connection.pending_versions = set()
+    if labels:
+        write_versions(labels)
+
+
+def bump_versions(*models):
+    """Новая версия таблиц после коммита текущей транзакции.
+
+    Таблицы копятся в наборе соединения и пишутся одним обработчиком
+    после коммита: строка версии не блокируется на время транзакций
+    писателей, а каждая таблица обновляется один раз, сколько бы
+    сигналов ее ни трогали. Обработчик регистрируется при каждом
+    вызове: после отката транзакции или точки сохранения набор
+    остается непустым, и его допишет следующий коммит. Лишняя версия
+    только сбрасывает кэши, а потерянная оставила бы их устаревшими.
+    """
+    labels = {model._meta.label_lower for model in models}
+    connection = transaction.get_connection()
+    if not hasattr(connection, 'pending_versions'):
+        connection.pending_versions = set()
+    connection.pending_versions |= labels
+    if not connection.in_atomic_block:
+        write_pending_versions(connection)
+        return
+    transaction.on_commit(lambda: write_pending_versions(connection))
@@ -0,0 +1,128 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import User
+
+USER_CACHE_SIZE = getattr(settings, 'USER_CACHE_SIZE', 1024)
+USER_CACHE_TTL = getattr(settings, 'USER_CACHE_TTL', 60)
+AUTH_VERSION_CACHE = getattr(
+    settings, 'AUTH_VERSION_CACHE', DEFAULT_CACHE_ALIAS
+)
+AUTH_VERSION_CACHE_TIMEOUT = getattr(
+    settings, 'AUTH_VERSION_CACHE_TIMEOUT', 60 * 60
+)
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def shared_cache(alias):
+    """Кэш alias или None, если он живет в памяти процесса.
+
+    Такой кэш не видит записей других процессов, поэтому то, что
+    должно меняться сразу во всех процессах, читается мимо него.
+    """
+    cache = caches[alias]
+    if isinstance(cache, PROCESS_LOCAL_CACHES):
+        return None
+    return cache
+
+
+class UserCache:
+    """Ограниченный LRU-кэш пользователей со временем жизни записей.
+
+    Кэш живет в памяти процесса; записи сбрасываются сигналами
+    при изменении пользователя, а в других процессах устаревают
+    не позже чем через ttl секунд.
+    """
+
+    def __init__(self, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[user_id]
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            # Копия, чтобы изменения в запросе не попали в кэш.
+            return copy.copy(entry[1])
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._data[user_id] = (time.monotonic() + self.ttl, user)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+
+
+user_cache = UserCache()
+
+
+def auth_version_key(user_id):
+    return f'auth-version:{user_id}'
+
+
+def get_auth_version(user_id):
+    """Версия прав пользователя: из общего кэша, а при промахе — из базы.
+
+    Для несуществующего пользователя — None.
+    """
+    cache = shared_cache(AUTH_VERSION_CACHE)
+    if cache is not None:
+        version = cache.get(auth_version_key(user_id))
+        if version is not None:
+            return version
+    version = User.objects.filter(pk=user_id).values_list(
+        'auth_version', flat=True
+    ).first()
+    if cache is not None and version is not None:
+        cache.add(
+            auth_version_key(user_id), version, AUTH_VERSION_CACHE_TIMEOUT
+        )
+    return version
+
+
+def set_auth_version(user_id, version):
+    """Записать новую версию прав или сбросить ее (version=None)."""
+    cache = shared_cache(AUTH_VERSION_CACHE)
+    if cache is None:
+        return
+    if version is None:
+        cache.delete(auth_version_key(user_id))
+    else:
+        cache.set(
+            auth_version_key(user_id), version, AUTH_VERSION_CACHE_TIMEOUT
+        )
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management import BaseCommand
+
+from users.outbox import BATCH_SIZE, deliver_batch, purge_emails
+
+# Как часто, в секундах, удаляются старые отправленные письма.
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество писем за одно соединение с сервером.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать очередь и завершиться.',
+        )
+
+    def handle(self, *args, **options):
+        purged = None
+        while True:
+            sent, failed = deliver_batch(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(
+                    f'Отправлено: {sent}, отложено: {failed}.'
+                )
+                continue
+            if purged is None or time.monotonic() - purged > PURGE_INTERVAL:
+                purge_emails()
+                purged = time.monotonic()
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -45,6 +46,11 @@ class User(AbstractUser):
         null=True,
         blank=False,
     )
+    auth_version = models.PositiveIntegerField(default=0, editable=False)
+
+    # Поля, которые попадают в клеймы токена: их изменение увеличивает
+    # auth_version и отзывает клеймы уже выданных токенов.
+    ACCESS_FIELDS = ('role', 'is_active', 'is_superuser')
 
     class Meta:
         ordering = ('id',)
@@ -52,6 +58,28 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_access = instance.access()
+        return instance
+
+    def access(self):
+        return tuple(
+            self.__dict__.get(field) for field in self.ACCESS_FIELDS
+        )
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None and getattr(
+            self, '_loaded_access', None
+        ) != self.access():
+            self.auth_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'auth_version'}
+        super().save(*args, **kwargs)
+        self._loaded_access = self.access()
+
     @property
     def is_admin(self):
         return self.role == self.ADMIN or self.is_superuser
@@ -63,3 +91,41 @@ class User(AbstractUser):
     @property
     def is_user(self):
         return self.role == self.USER
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди на отправку."""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICE = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipient = models.EmailField(max_length=254)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICE,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    created = models.DateTimeField(auto_now_add=True)
+    sent = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('next_attempt',)
+        indexes = [
+            models.Index(
+                fields=['status', 'next_attempt'],
+                name='outgoing_email_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject}'
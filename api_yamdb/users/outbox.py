@@ -0,0 +1,123 @@
+import datetime as dt
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_DELAY = dt.timedelta(seconds=30)
+# Срок, на который письма пачки закрепляются за отправителем.
+CLAIM_TIMEOUT = dt.timedelta(minutes=10)
+# Сколько хранятся отправленные и неотправляемые письма.
+RETENTION = dt.timedelta(days=7)
+
+
+def enqueue_email(subject, message, recipient, from_email=None):
+    """Постановка письма в очередь вместо отправки в запросе."""
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        message=message,
+        from_email=from_email or settings.FROM_EMAIL,
+        recipient=recipient,
+    )
+
+
+def retry_later(email, error, now):
+    """Отложить письмо с экспоненциальной задержкой."""
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = OutgoingEmail.FAILED
+        # Код подтверждения в тексте письма больше не нужен.
+        email.message = ''
+    else:
+        email.next_attempt = now + RETRY_DELAY * 2 ** (email.attempts - 1)
+    email.save(update_fields=(
+        'status', 'attempts', 'next_attempt', 'last_error', 'message'
+    ))
+
+
+def mark_sent(email):
+    """Отметка об отправке; текст письма с кодом стирается."""
+    OutgoingEmail.objects.filter(pk=email.pk).update(
+        status=OutgoingEmail.SENT,
+        sent=timezone.now(),
+        message='',
+        last_error='',
+    )
+
+
+def claim_batch(batch_size, now):
+    """Захват пачки писем в короткой транзакции.
+
+    Захваченным письмам next_attempt сдвигается на CLAIM_TIMEOUT
+    вперед: другие отправители их пропускают, а если процесс упадет
+    до отметки, письма снова попадут в очередь по истечении срока.
+    """
+    with transaction.atomic():
+        emails = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutgoingEmail.PENDING, next_attempt__lte=now)
+            [:batch_size]
+        )
+        OutgoingEmail.objects.filter(
+            pk__in=[email.pk for email in emails]
+        ).update(next_attempt=now + CLAIM_TIMEOUT)
+    return emails
+
+
+def deliver_batch(batch_size=BATCH_SIZE):
+    """Отправка пачки писем через одно соединение с почтовым сервером.
+
+    Письма отправляются вне транзакции, и каждое отмечается сразу
+    после отправки: сбой посередине пачки не приведет к повторной
+    отправке уже доставленных. Возвращает количество отправленных
+    и отложенных писем.
+    """
+    now = timezone.now()
+    sent = failed = 0
+    emails = claim_batch(batch_size, now)
+    if not emails:
+        return sent, failed
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            retry_later(email, error, now)
+        return sent, len(emails)
+    try:
+        for email in emails:
+            try:
+                EmailMessage(
+                    subject=email.subject,
+                    body=email.message,
+                    from_email=email.from_email,
+                    to=[email.recipient],
+                    connection=connection,
+                ).send()
+            except Exception as error:
+                retry_later(email, error, now)
+                failed += 1
+            else:
+                mark_sent(email)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def purge_emails(older_than=RETENTION):
+    """Удаление отправленных и неотправляемых писем старше older_than.
+
+    Возвращает количество удаленных писем.
+    """
+    deleted, _ = OutgoingEmail.objects.filter(
+        status__in=(OutgoingEmail.SENT, OutgoingEmail.FAILED),
+        created__lt=timezone.now() - older_than,
+    ).delete()
+    return deleted
@@ -0,0 +1,16 @@
+import pytest
+from django.conf import settings
+from django.core.cache import caches
+
+from users.cache import user_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    user_cache.clear()
+    yield
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    user_cache.clear()
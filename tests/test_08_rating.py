@@ -0,0 +1,148 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import (RATING_MIN_VOTES, RATING_PRIOR_MEAN, Review,
+                            Title)
+from tests.utils import create_reviews
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08RatingCounters:
+
+    def check_counters(self, title_id, score_sum, review_count):
+        title = Title.objects.get(pk=title_id)
+        assert (title.score_sum, title.review_count) == (
+            score_sum, review_count
+        ), (
+            'Проверьте, что счетчики `score_sum` и `review_count` '
+            'произведения обновляются при изменении отзывов.'
+        )
+        expected_rating = score_sum / review_count if review_count else None
+        assert title.rating == expected_rating, (
+            'Проверьте, что поле `rating` произведения пересчитывается '
+            'вместе со счетчиками отзывов.'
+        )
+        expected_weighted = (
+            (score_sum + RATING_MIN_VOTES * RATING_PRIOR_MEAN)
+            / (review_count + RATING_MIN_VOTES)
+        )
+        assert title.weighted_rating == pytest.approx(expected_weighted), (
+            'Проверьте, что поле `weighted_rating` произведения '
+            'пересчитывается вместе со счетчиками отзывов.'
+        )
+
+    def test_01_counters_follow_reviews(self, admin_client, admin,
+                                        user_client, user,
+                                        moderator_client, moderator):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        reviews, titles = create_reviews(admin_client, author_map)
+        title_id = titles[0]['id']
+        url = f'/api/v1/titles/{title_id}/reviews/'
+        self.check_counters(title_id, 15, 3)
+
+        user_client.patch(f'{url}{reviews[1]["id"]}/', data={'score': 8})
+        self.check_counters(title_id, 18, 3)
+
+        admin_client.delete(f'{url}{reviews[0]["id"]}/')
+        self.check_counters(title_id, 13, 2)
+
+        moderator.delete()
+        self.check_counters(title_id, 8, 1)
+
+        user_client.delete(f'{url}{reviews[1]["id"]}/')
+        self.check_counters(title_id, 0, 0)
+
+        response = admin_client.get(f'/api/v1/titles/{title_id}/')
+        assert response.json().get('rating') is None, (
+            'Проверьте, что после удаления всех отзывов поле `rating` '
+            'произведения равно `None`.'
+        )
+
+    def test_02_recount_ratings_command(self, admin_client, admin,
+                                        user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, author_map)
+        title_id = titles[0]['id']
+        Title.objects.filter(pk=title_id).update(
+            score_sum=0, review_count=0, rating=None
+        )
+
+        with pytest.raises(CommandError):
+            call_command('recount_ratings', check=True, stdout=StringIO())
+        call_command('recount_ratings', stdout=StringIO())
+        self.check_counters(title_id, 10, 2)
+        call_command('recount_ratings', check=True, stdout=StringIO())
+
+    def test_03_recount_weighted_rating(self, admin_client, admin,
+                                        user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, author_map)
+        Title.objects.filter(pk=titles[0]['id']).update(weighted_rating=0)
+        with pytest.raises(CommandError):
+            call_command('recount_ratings', check=True, stdout=StringIO())
+        call_command('recount_ratings', stdout=StringIO())
+        self.check_counters(titles[0]['id'], 10, 2)
+
+    def test_04_order_by_weighted_rating(self, client, django_user_model):
+        authors = [
+            django_user_model.objects.create_user(
+                username=f'author{index}', email=f'author{index}@yamdb.fake'
+            )
+            for index in range(4)
+        ]
+        scores = {
+            'Один отзыв на 10': [10],
+            'Четыре отзыва на 8': [8, 8, 8, 8],
+            'Без отзывов': [],
+            'Один отзыв на 1': [1],
+        }
+        for name, title_scores in scores.items():
+            title = Title.objects.create(name=name, year=2000)
+            for author, score in zip(authors, title_scores):
+                Review.objects.create(
+                    title=title, author=author, text='text', score=score
+                )
+        expected = [
+            'Четыре отзыва на 8', 'Один отзыв на 10',
+            'Без отзывов', 'Один отзыв на 1',
+        ]
+
+        response = client.get('/api/v1/titles/?ordering=-rating')
+        names = [title['name'] for title in response.json()['results']]
+        assert names == expected, (
+            'Проверьте, что `/api/v1/titles/?ordering=-rating` сортирует '
+            'произведения по взвешенному рейтингу: пара высоких оценок '
+            'не должна поднимать произведение выше многих хороших.'
+        )
+        response = client.get('/api/v1/titles/?ordering=rating')
+        names = [title['name'] for title in response.json()['results']]
+        assert names == expected[::-1]
+        response = client.get('/api/v1/titles/?ordering=unknown')
+        assert response.status_code == 400, (
+            'Проверьте, что сортировка по неизвестному полю '
+            'возвращает ошибку 400.'
+        )
+
+    def test_05_title_delete_skips_counters(self, admin_client, admin,
+                                            user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, author_map)
+        title = Title.objects.get(pk=titles[0]['id'])
+        with CaptureQueriesContext(connection) as context:
+            title.delete()
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "reviews_title"')
+        ]
+        assert not updates, (
+            'Проверьте, что при удалении произведения каскадное удаление '
+            'его отзывов не сдвигает счетчики удаляемого произведения.'
+        )
@@ -0,0 +1,265 @@
+import pytest
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.authentication import get_access_token
+from api.middleware import query_budget
+
+from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.versions import get_versions
+from users.models import User
+
+
+def create_titles_bulk(count):
+    category = Category.objects.create(name='Фильм', slug='films')
+    genres = [
+        Genre.objects.create(name='Драма', slug='drama'),
+        Genre.objects.create(name='Комедия', slug='comedy'),
+    ]
+    titles = []
+    for idx in range(count):
+        title = Title.objects.create(
+            name=f'Произведение {idx}', year=2000, category=category
+        )
+        title.genre.set(genres)
+        titles.append(title)
+    # Версии таблиц для ETag попадают в кэш при первом запросе.
+    get_versions(Category, Comment, Genre, Review, Title, User)
+    return titles
+
+
+def count_queries(client, url, data=None):
+    with CaptureQueriesContext(connection) as context:
+        if data is None:
+            response = client.get(url)
+        else:
+            response = client.post(url, data=data)
+    assert response.status_code == 200
+    return len(context)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09QueryCount:
+
+    def test_01_title_list_query_count(self, client):
+        create_titles_bulk(20)
+        small_page = count_queries(client, '/api/v1/titles/?limit=1')
+        big_page = count_queries(client, '/api/v1/titles/?limit=20')
+        assert small_page == big_page == 3, (
+            'Проверьте, что GET-запрос к `/api/v1/titles/` выполняет '
+            'постоянное число запросов к базе данных, не зависящее от '
+            'размера страницы.'
+        )
+
+    def test_02_title_detail_query_count(self, client):
+        title = create_titles_bulk(1)[0]
+        assert count_queries(client, f'/api/v1/titles/{title.id}/') == 2, (
+            'Проверьте, что GET-запрос к `/api/v1/titles/{title_id}/` '
+            'загружает категорию и жанры без дополнительных запросов.'
+        )
+
+    def test_03_review_cursor_pagination(self, client, django_user_model):
+        title = create_titles_bulk(1)[0]
+        for idx in range(7):
+            author = django_user_model.objects.create_user(
+                username=f'author{idx}', email=f'author{idx}@yamdb.fake'
+            )
+            Review.objects.create(
+                title=title, author=author, text='text', score=5
+            )
+        url = f'/api/v1/titles/{title.id}/reviews/?cursor=&limit=3'
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                data = client.get(url).json()
+            assert not any(
+                'COUNT(' in query['sql'].upper()
+                for query in context.captured_queries
+            ), (
+                'Проверьте, что курсорная пагинация отзывов не выполняет '
+                'запрос COUNT(*).'
+            )
+            seen.extend(review['id'] for review in data['results'])
+            url = data['next']
+        expected = list(
+            Review.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True)
+        )
+        assert seen == expected, (
+            'Проверьте, что курсорная пагинация по `/api/v1/titles/'
+            '{title_id}/reviews/?cursor=` возвращает все отзывы в порядке '
+            'убывания даты публикации.'
+        )
+
+    def test_04_signup_query_count(self, client):
+        url = '/api/v1/auth/signup/'
+        data = {'email': 'valid@yamdb.fake', 'username': 'valid_username'}
+        assert count_queries(client, url, data) <= 4, (
+            f'Проверьте, что регистрация через `{url}` выполняет не больше '
+            'четырех запросов: поиск, создание пользователя в транзакции '
+            'и письмо в очередь.'
+        )
+        assert count_queries(client, url, data) <= 2, (
+            f'Проверьте, что повторный запрос кода через `{url}` выполняет '
+            'не больше двух запросов к базе данных.'
+        )
+
+    def test_05_token_user_cached(self, client, admin):
+        title = create_titles_bulk(1)[0]
+        url = f'/api/v1/titles/{title.id}/'
+        admin_client = APIClient()
+        admin_client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {get_access_token(admin)}'
+        )
+        # Первый запрос загружает пользователя в кэш.
+        admin_client.get(url)
+        assert count_queries(admin_client, url) == count_queries(
+            client, url
+        ), (
+            'Проверьте, что токен, выданный на `/api/v1/auth/token/`, '
+            'не требует запроса пользователя к базе данных при повторном '
+            'чтении.'
+        )
+        response = admin_client.patch(url, data={'name': 'Новое имя'})
+        assert response.status_code == 200, (
+            'Проверьте, что права администратора определяются по токену.'
+        )
+        response = admin_client.get('/api/v1/users/me/')
+        assert response.json().get('bio') == admin.bio, (
+            'Проверьте, что `/api/v1/users/me/` возвращает полный профиль '
+            'пользователя.'
+        )
+
+    def test_06_title_create_query_count(self, admin_client):
+        create_titles_bulk(0)
+        Genre.objects.create(name='Ужасы', slug='horror')
+        url = '/api/v1/titles/'
+        counts = []
+        # Первый запрос прогревает кэш пользователя и версий таблиц.
+        for genres in (['drama'], ['drama'], ['drama', 'comedy', 'horror']):
+            data = {
+                'name': 'Произведение', 'year': 2000,
+                'genre': genres, 'category': 'films'
+            }
+            with CaptureQueriesContext(connection) as context:
+                response = admin_client.post(url, data=data)
+            assert response.status_code == 201
+            assert response.json()['genre'] == genres
+            counts.append(len(context))
+        assert counts[1] == counts[2], (
+            f'Проверьте, что POST-запрос к `{url}` разрешает все жанры '
+            'одним запросом и записывает их одной вставкой.'
+        )
+
+        data['genre'] = ['drama', 'unknown', 'missing']
+        response = admin_client.post(url, data=data)
+        assert response.status_code == 400
+        error = str(response.json()['genre'])
+        assert 'unknown' in error and 'missing' in error, (
+            f'Проверьте, что POST-запрос к `{url}` сообщает обо всех '
+            'несуществующих жанрах сразу.'
+        )
+
+    def test_07_nested_parent_fetched_once(self, user_client, user):
+        title = create_titles_bulk(1)[0]
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        user_client.get('/api/v1/users/me/')
+
+        def post_and_count_selects(post_url, data):
+            with CaptureQueriesContext(connection) as context:
+                response = user_client.post(post_url, data=data)
+            selects = [
+                query['sql'] for query in context.captured_queries
+                if query['sql'].startswith('SELECT')
+            ]
+            # Объект читается со всеми полями, а счетчики для сигналов —
+            # отдельным запросом без них.
+            return response, {
+                table: sum(f'"{table}"."{field}"' in sql for sql in selects)
+                for table, field in (
+                    ('reviews_title', 'name'), ('reviews_review', 'text')
+                )
+            }
+
+        response, selects = post_and_count_selects(
+            url, {'text': 'text', 'score': 5}
+        )
+        assert response.status_code == 201
+        assert selects['reviews_title'] == 1, (
+            f'Проверьте, что POST-запрос к `{url}` загружает произведение '
+            'из базы данных один раз.'
+        )
+        assert selects['reviews_review'] == 0, (
+            f'Проверьте, что POST-запрос к `{url}` не проверяет повторный '
+            'отзыв отдельным запросом: это делает ограничение unique_review.'
+        )
+
+        comments_url = f'{url}{response.json()["id"]}/comments/'
+        response, selects = post_and_count_selects(
+            comments_url, {'text': 'text'}
+        )
+        assert response.status_code == 201
+        assert selects['reviews_review'] == 1, (
+            f'Проверьте, что POST-запрос к `{comments_url}` загружает отзыв '
+            'из базы данных один раз.'
+        )
+
+        response = user_client.post(url, data={'text': 'text', 'score': 1})
+        assert response.status_code == 400
+        assert 'non_field_errors' in response.json(), (
+            f'Проверьте, что повторный POST-запрос к `{url}` возвращает '
+            'ошибку валидации `non_field_errors`.'
+        )
+        title.refresh_from_db()
+        assert (title.score_sum, title.review_count) == (5, 1)
+
+    def test_08_foreign_integrity_error_not_masked(self, user_client,
+                                                   monkeypatch):
+        title = create_titles_bulk(1)[0]
+        url = f'/api/v1/titles/{title.id}/reviews/'
+
+        def fail(*args, **kwargs):
+            raise IntegrityError('UNIQUE constraint failed: reviews_toptitle')
+
+        monkeypatch.setattr('reviews.signals.update_top', fail)
+        with pytest.raises(IntegrityError):
+            user_client.post(url, data={'text': 'text', 'score': 5})
+        assert not Review.objects.exists(), (
+            'Проверьте, что ошибка целостности, не связанная с повторным '
+            'отзывом, не выдается за ошибку валидации.'
+        )
+
+    def test_09_review_writes_within_budget(self, user_client, admin_client):
+        titles = create_titles_bulk(2)
+        # Первый отзыв заводит строки версий и читает отметку трендов,
+        # его удаление — строку версии комментариев.
+        first = admin_client.post(
+            f'/api/v1/titles/{titles[1].id}/reviews/',
+            data={'text': 'text', 'score': 3},
+        ).json()
+        admin_client.delete(
+            f'/api/v1/titles/{titles[1].id}/reviews/{first["id"]}/'
+        )
+        url = f'/api/v1/titles/{titles[0].id}/reviews/'
+        admin_client.post(url, data={'text': 'text', 'score': 9})
+        user_client.get('/api/v1/users/me/')
+
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post(url, data={'text': 't', 'score': 5})
+        assert response.status_code == 201
+        counts = {('POST', 'api:reviews-list'): len(context)}
+        detail = f'{url}{response.json()["id"]}/'
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.patch(detail, data={'score': 7})
+        assert response.status_code == 200
+        counts['PATCH', 'api:reviews-detail'] = len(context)
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.delete(detail)
+        assert response.status_code == 204
+        counts['DELETE', 'api:reviews-detail'] = len(context)
+        for (method, view_name), count in counts.items():
+            assert count <= query_budget(method, view_name), (
+                f'Проверьте, что {method}-запрос к отзыву укладывается '
+                f'в бюджет запросов: сейчас {count}.'
+            )
@@ -0,0 +1,94 @@
+import csv
+import os
+import shutil
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+
+from reviews.management.commands.load_csv import TABLES, dependency_levels
+from reviews.models import (Category, Comment, Review, Title, TitleGenre,
+                            User)
+
+DATA_DIR = os.path.join(settings.BASE_DIR, 'static', 'data')
+
+
+def csv_rows(filename):
+    with open(os.path.join(DATA_DIR, filename), encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10LoadCSV:
+
+    def test_01_load_csv(self):
+        call_command('load_csv', batch_size=10, stdout=StringIO())
+        for model, filename in (
+            (User, 'users.csv'),
+            (Title, 'titles.csv'),
+            (TitleGenre, 'genre_title.csv'),
+            (Review, 'review.csv'),
+            (Comment, 'comments.csv'),
+        ):
+            assert model.objects.count() == len(csv_rows(filename)), (
+                f'Проверьте, что команда `load_csv` загружает все строки '
+                f'из `{filename}`.'
+            )
+        first_review = csv_rows('review.csv')[0]
+        review = Review.objects.get(pk=first_review['id'])
+        assert review.author_id == int(first_review['author']), (
+            'Проверьте, что `load_csv` связывает отзыв с автором по id.'
+        )
+        assert review.pub_date.isoformat().startswith(
+            first_review['pub_date'][:19]
+        ), (
+            'Проверьте, что `load_csv` сохраняет дату публикации из CSV.'
+        )
+        call_command('recount_ratings', check=True, stdout=StringIO())
+
+    def test_02_load_csv_upsert(self, tmp_path):
+        call_command('load_csv', stdout=StringIO())
+        data_dir = tmp_path / 'data'
+        shutil.copytree(DATA_DIR, data_dir)
+        reviews = csv_rows('review.csv')
+        reviews[0]['score'] = '1'
+        with open(data_dir / 'review.csv', 'w', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=reviews[0].keys())
+            writer.writeheader()
+            writer.writerows(reviews)
+        with open(data_dir / 'category.csv', 'a', encoding='utf-8') as f:
+            f.write('\n99,Новая,new-category\n')
+
+        out = StringIO()
+        call_command('load_csv', path=str(data_dir), upsert=True, stdout=out)
+        assert Category.objects.filter(slug='new-category').exists(), (
+            'Проверьте, что `load_csv --upsert` добавляет новые строки.'
+        )
+        assert Review.objects.get(pk=reviews[0]['id']).score == 1, (
+            'Проверьте, что `load_csv --upsert` обновляет измененные строки.'
+        )
+        report = out.getvalue()
+        assert 'Review: 72 строк' in report and 'обновлено 1,' in report, (
+            'Проверьте, что `load_csv --upsert` выводит число добавленных '
+            'и обновленных строк для каждой таблицы.'
+        )
+        call_command('recount_ratings', check=True, stdout=StringIO())
+
+    def test_03_load_csv_dependency_levels(self):
+        levels = dependency_levels(list(TABLES))
+        position = {
+            model: idx for idx, level in enumerate(levels) for model in level
+        }
+        for model in TABLES:
+            for field in model._meta.concrete_fields:
+                if field.is_relation and field.related_model in TABLES:
+                    assert position[field.related_model] < position[model], (
+                        'Проверьте, что `load_csv` загружает таблицу '
+                        f'`{model.__name__}` после таблицы '
+                        f'`{field.related_model.__name__}`.'
+                    )
+        call_command('load_csv', workers=4, stdout=StringIO())
+        assert Comment.objects.count() == len(csv_rows('comments.csv')), (
+            'Проверьте, что `load_csv --workers` загружает все таблицы.'
+        )
@@ -0,0 +1,110 @@
+import datetime as dt
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from users.models import OutgoingEmail
+from users.outbox import RETENTION, purge_emails
+
+
+class BrokenEmailBackend(BaseEmailBackend):
+
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP недоступен')
+
+
+class CheckingEmailBackend(BaseEmailBackend):
+    in_transaction = []
+
+    def send_messages(self, email_messages):
+        self.in_transaction.append(connection.in_atomic_block)
+        return len(email_messages)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11EmailOutbox:
+    url_signup = '/api/v1/auth/signup/'
+    valid_data = {
+        'email': 'valid@yamdb.fake',
+        'username': 'valid_username'
+    }
+
+    def test_01_signup_only_enqueues(self, client):
+        outbox_before_count = len(mail.outbox)
+        client.post(self.url_signup, data=self.valid_data)
+        assert len(mail.outbox) == outbox_before_count, (
+            f'Проверьте, что POST-запрос к `{self.url_signup}` не отправляет '
+            'письмо сразу, а ставит его в очередь.'
+        )
+        email = OutgoingEmail.objects.get()
+        assert email.recipient == self.valid_data['email']
+
+        call_command('send_emails', once=True)
+        email.refresh_from_db()
+        assert email.status == OutgoingEmail.SENT, (
+            'Проверьте, что команда `send_emails` отправляет письма '
+            'из очереди.'
+        )
+        assert len(mail.outbox) == outbox_before_count + 1
+
+    def test_02_failed_email_is_retried(self, client, settings):
+        client.post(self.url_signup, data=self.valid_data)
+        settings.EMAIL_BACKEND = 'tests.test_11_outbox.BrokenEmailBackend'
+        call_command('send_emails', once=True)
+        email = OutgoingEmail.objects.get()
+        assert email.status == OutgoingEmail.PENDING, (
+            'Проверьте, что письмо, которое не удалось отправить, '
+            'остается в очереди для повторной попытки.'
+        )
+        assert email.attempts == 1 and email.next_attempt > email.created, (
+            'Проверьте, что повторная отправка письма откладывается.'
+        )
+
+    def test_03_sent_outside_transaction(self, client, settings):
+        CheckingEmailBackend.in_transaction.clear()
+        client.post(self.url_signup, data=self.valid_data)
+        settings.EMAIL_BACKEND = 'tests.test_11_outbox.CheckingEmailBackend'
+        call_command('send_emails', once=True)
+        assert CheckingEmailBackend.in_transaction == [False], (
+            'Проверьте, что письма отправляются вне транзакции: '
+            'строки очереди не должны быть заблокированы на время отправки.'
+        )
+        email = OutgoingEmail.objects.get()
+        assert email.status == OutgoingEmail.SENT
+        assert email.message == '', (
+            'Проверьте, что текст отправленного письма с кодом '
+            'подтверждения стирается.'
+        )
+
+    def test_04_old_emails_purged(self, client):
+        client.post(self.url_signup, data=self.valid_data)
+        call_command('send_emails', once=True)
+        OutgoingEmail.objects.update(
+            created=timezone.now() - RETENTION - dt.timedelta(minutes=1)
+        )
+        assert purge_emails() == 1, (
+            'Проверьте, что отправленные письма удаляются из очереди '
+            'по истечении срока хранения.'
+        )
+        assert not OutgoingEmail.objects.exists()
+
+    def test_05_signup_rolled_back_without_email(self, client,
+                                                 django_user_model,
+                                                 monkeypatch):
+        def fail(**kwargs):
+            raise RuntimeError('очередь писем недоступна')
+
+        monkeypatch.setattr('api.views.enqueue_email', fail)
+        with pytest.raises(RuntimeError):
+            client.post(self.url_signup, data=self.valid_data)
+        assert not django_user_model.objects.filter(
+            username=self.valid_data['username']
+        ).exists(), (
+            'Проверьте, что пользователь и письмо с кодом подтверждения '
+            'сохраняются в одной транзакции: если письмо не встало '
+            'в очередь, пользователь не создается.'
+        )
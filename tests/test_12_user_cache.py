@@ -0,0 +1,115 @@
+from http import HTTPStatus
+
+import pytest
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from api.authentication import (ClaimsUser, StatelessJWTAuthentication,
+                                get_access_token)
+from users.cache import user_cache
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12UserCache:
+
+    def test_01_cached_user_lookup(self, user_client):
+        url = '/api/v1/users/me/'
+        user_client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        assert len(context) == 0, (
+            'Проверьте, что повторный запрос с тем же токеном берет '
+            'пользователя из кэша, а не из базы данных.'
+        )
+        stats = user_cache.stats()
+        assert stats['hits'] == 1 and stats['misses'] == 1, (
+            'Проверьте, что кэш пользователей считает попадания и промахи.'
+        )
+
+    def test_02_role_change_invalidates_cache(self, admin_client,
+                                              user_client, user):
+        url = '/api/v1/users/'
+        response = user_client.get(url)
+        assert response.status_code == HTTPStatus.FORBIDDEN
+
+        admin_client.patch(f'{url}{user.username}/', data={'role': 'admin'})
+        response = user_client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что изменение роли пользователя через '
+            f'`{url}{{username}}/` сразу сбрасывает его запись в кэше.'
+        )
+
+    def test_03_issued_token_sees_role_change(self, admin_client, user):
+        response = APIClient().post('/api/v1/auth/token/', data={
+            'username': user.username,
+            'confirmation_code': default_token_generator.make_token(user),
+        })
+        assert response.status_code == HTTPStatus.OK
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {response.json()["token"]}'
+        )
+        url = '/api/v1/users/'
+        assert client.get(url).status_code == HTTPStatus.FORBIDDEN
+
+        admin_client.patch(f'{url}{user.username}/', data={'role': 'admin'})
+        assert client.get(url).status_code == HTTPStatus.OK, (
+            'Проверьте, что смена роли сразу действует и для токена, '
+            'выданного на `/api/v1/auth/token/`.'
+        )
+        admin_client.patch(f'{url}{user.username}/', data={'role': 'user'})
+        assert client.get(url).status_code == HTTPStatus.FORBIDDEN
+
+    def test_04_inactive_user_rejected(self, user):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {get_access_token(user)}'
+        )
+        url = '/api/v1/users/me/'
+        assert client.get(url).status_code == HTTPStatus.OK
+        user.is_active = False
+        user.save()
+        assert client.get(url).status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что токен заблокированного пользователя сразу '
+            'перестает действовать.'
+        )
+
+    def test_05_stateless_claims_revoked(self, user):
+        authentication = StatelessJWTAuthentication()
+        token = get_access_token(user)
+        authentication.get_user(token)
+        with CaptureQueriesContext(connection) as context:
+            assert isinstance(authentication.get_user(token), ClaimsUser)
+        assert len(context) == 0, (
+            'Проверьте, что права из клеймов токена проверяются '
+            'без запросов к базе данных.'
+        )
+
+        user.bio = 'Новое описание'
+        user.save()
+        assert isinstance(authentication.get_user(token), ClaimsUser), (
+            'Проверьте, что изменение профиля без смены прав не отзывает '
+            'клеймы выданных токенов.'
+        )
+
+        user.role = user.ADMIN
+        user.save()
+        resolved = authentication.get_user(token)
+        assert not isinstance(resolved, ClaimsUser) and resolved.is_admin, (
+            'Проверьте, что после смены роли права из клеймов старого '
+            'токена проверяются по базе.'
+        )
+        assert isinstance(
+            authentication.get_user(get_access_token(user)), ClaimsUser
+        )
+
+        user.is_active = False
+        user.save()
+        with pytest.raises(AuthenticationFailed):
+            authentication.get_user(token)
+        with pytest.raises(AuthenticationFailed):
+            authentication.get_user(get_access_token(user))
@@ -0,0 +1,43 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.utils import create_categories, create_genre
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13ListCache:
+
+    @pytest.mark.parametrize('url,create', (
+        ('/api/v1/categories/', create_categories),
+        ('/api/v1/genres/', create_genre),
+    ))
+    def test_01_list_cache(self, client, admin_client, url, create):
+        objects = create(admin_client)
+        client.get(f'{url}?search={objects[0]["name"]}&limit=2')
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(
+                f'{url}?limit=2&search={objects[0]["name"]}'
+            )
+        assert response.status_code == HTTPStatus.OK
+        assert len(context) == 0, (
+            f'Проверьте, что повторный GET-запрос к `{url}` с теми же '
+            'параметрами в любом порядке отдается из кэша.'
+        )
+        assert response.json()['count'] == 1
+
+        new_object = {'name': 'Новый', 'slug': 'new-slug'}
+        admin_client.post(url, data=new_object)
+        response = client.get(url)
+        assert new_object in response.json()['results'], (
+            f'Проверьте, что POST-запрос к `{url}` сбрасывает кэш списка.'
+        )
+
+        admin_client.delete(f'{url}{new_object["slug"]}/')
+        response = client.get(url)
+        assert new_object not in response.json()['results'], (
+            f'Проверьте, что DELETE-запрос к `{url}{{slug}}/` сбрасывает '
+            'кэш списка.'
+        )
@@ -0,0 +1,211 @@
+import time
+from http import HTTPStatus
+
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+
+from reviews.models import Comment, Review, TableVersion, Title
+from reviews.versions import (bump_versions, get_version, get_versions,
+                              version_cache, version_key)
+from tests.utils import create_reviews, create_single_review
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14ConditionalGet:
+
+    def test_01_title_etag(self, client, admin_client, admin, user_client,
+                           user):
+        _, titles = create_reviews(admin_client, {admin: admin_client})
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        response = client.get(url)
+        etag = response.get('ETag')
+        assert etag, (
+            f'Проверьте, что ответ на GET-запрос к `{url}` содержит '
+            'заголовок `ETag`.'
+        )
+        assert 'Last-Modified' not in response, (
+            'Проверьте, что `Last-Modified` не отдается: с точностью '
+            'до секунды он пропускает изменения в ту же секунду.'
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            f'Проверьте, что GET-запрос к `{url}` с актуальным '
+            '`If-None-Match` возвращает ответ со статусом 304.'
+        )
+        assert len(context) == 0, (
+            'Проверьте, что ответ 304 отдается без запросов к базе данных.'
+        )
+
+        create_single_review(user_client, titles[0]['id'], 'text', 9)
+        response = client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что `If-Modified-Since` не дает ответ 304 '
+            'после изменения.'
+        )
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что после нового отзыва `ETag` произведения '
+            'меняется.'
+        )
+        assert response.json()['rating'] == 7
+
+    def test_02_review_list_etag(self, client, admin_client, admin):
+        reviews, titles = create_reviews(admin_client, {admin: admin_client})
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        etag = client.get(url)['ETag']
+        assert client.get(
+            url, HTTP_IF_NONE_MATCH=etag
+        ).status_code == HTTPStatus.NOT_MODIFIED
+        admin_client.patch(f'{url}{reviews[0]["id"]}/', data={'text': 'new'})
+        assert client.get(
+            url, HTTP_IF_NONE_MATCH=etag
+        ).status_code == HTTPStatus.OK, (
+            'Проверьте, что изменение отзыва меняет `ETag` списка отзывов.'
+        )
+
+    def test_03_table_versions(self):
+        before = get_version(Review)
+        call_command('load_csv', stdout=StringIO())
+        after = get_version(Review)
+        assert after > before, (
+            'Проверьте, что `load_csv` увеличивает версии загруженных таблиц.'
+        )
+        version_cache().clear()
+        assert get_version(Review) == after == TableVersion.objects.get(
+            table='reviews.review'
+        ).version, (
+            'Проверьте, что версии таблиц хранятся в базе данных.'
+        )
+
+        before = get_version(Title)
+        Title.objects.first().genre.clear()
+        assert get_version(Title) > before, (
+            'Проверьте, что изменение жанров произведения увеличивает '
+            'версию таблицы произведений.'
+        )
+
+    def test_04_versions_written_after_commit(self):
+        TableVersion.objects.all().delete()
+        with CaptureQueriesContext(connection) as context:
+            assert get_versions(Review, Title) == [0, 0]
+        assert all(
+            query['sql'].startswith('SELECT')
+            for query in context.captured_queries
+        ), (
+            'Проверьте, что чтение версий ничего не пишет в базу данных.'
+        )
+
+        with transaction.atomic():
+            bump_versions(Review)
+            bump_versions(Review, Title)
+            assert not TableVersion.objects.exists(), (
+                'Проверьте, что версии таблиц записываются после коммита, '
+                'а не блокируют строку версии на время транзакции.'
+            )
+        version = TableVersion.objects.get(table='reviews.review').version
+        assert version_cache().get(
+            version_key('reviews.review')
+        ) == version, (
+            'Проверьте, что после коммита в кэш записывается новая версия, '
+            'и чтение, начатое до нее, не вернет в кэш старую.'
+        )
+        version_cache().add(version_key('reviews.review'), 0)
+        assert get_version(Review) == version
+
+        with transaction.atomic():
+            bump_versions(Title)
+            transaction.set_rollback(True)
+        assert get_version(Title) == TableVersion.objects.get(
+            table='reviews.title'
+        ).version, (
+            'Проверьте, что откат транзакции не меняет версию таблицы.'
+        )
+
+        before = get_version(Review)
+        with transaction.atomic():
+            bump_versions(Review)
+        assert get_version(Review) > before, (
+            'Проверьте, что после отката транзакции версии следующей '
+            'транзакции записываются при ее коммите.'
+        )
+
+    def test_05_comment_version_without_delete_signal(self,
+                                                      django_user_model):
+        authors = [
+            django_user_model.objects.create_user(
+                username=f'author{index}', email=f'author{index}@yamdb.fake'
+            )
+            for index in range(2)
+        ]
+        title = Title.objects.create(name='Произведение', year=2000)
+        reviews = [
+            Review.objects.create(
+                title=title, author=author, text='text', score=5
+            )
+            for author in authors
+        ]
+
+        def add_comment(review, author=authors[0]):
+            return Comment.objects.create(
+                review=review, author=author, text='text'
+            )
+
+        def deletes_bump(delete, message):
+            before = get_version(Comment)
+            delete()
+            assert get_version(Comment) > before, message
+
+        deletes_bump(
+            add_comment(reviews[0]).delete,
+            'Проверьте, что удаление комментария меняет версию таблицы '
+            'комментариев.'
+        )
+        deletes_bump(
+            Comment.objects.filter(pk=add_comment(reviews[0]).pk).delete,
+            'Проверьте, что удаление набора комментариев меняет версию '
+            'таблицы комментариев.'
+        )
+        add_comment(reviews[0])
+        with CaptureQueriesContext(connection) as context:
+            deletes_bump(
+                reviews[0].delete,
+                'Проверьте, что каскадное удаление комментариев с отзывом '
+                'меняет версию таблицы комментариев.'
+            )
+        assert not any(
+            query['sql'].startswith('SELECT')
+            and 'FROM "reviews_comment"' in query['sql']
+            for query in context.captured_queries
+        ), (
+            'Проверьте, что комментарии удаляются каскадом одним запросом, '
+            'без выборки для сигналов.'
+        )
+        add_comment(reviews[1])
+        deletes_bump(
+            authors[0].delete,
+            'Проверьте, что удаление пользователя вместе с его '
+            'комментариями меняет версию таблицы комментариев.'
+        )
+
+    def test_06_process_local_cache_skipped(self, monkeypatch):
+        bump_versions(Review)
+        monkeypatch.setattr('reviews.versions.VERSION_CACHE', 'default')
+        assert version_cache() is None
+        TableVersion.objects.filter(table='reviews.review').update(
+            version=get_version(Review) + 1
+        )
+        assert get_version(Review) == TableVersion.objects.get(
+            table='reviews.review'
+        ).version, (
+            'Проверьте, что при кэше в памяти процесса версии таблиц '
+            'читаются из базы: версии других процессов он не видит.'
+        )
@@ -0,0 +1,59 @@
+import logging
+from http import HTTPStatus
+
+import pytest
+
+from api.metrics import metrics_report
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15QueryMetrics:
+
+    @pytest.fixture(autouse=True)
+    def clear_report(self):
+        metrics_report.clear()
+        yield
+        metrics_report.clear()
+
+    def test_01_server_timing(self, client, admin_client):
+        create_titles(admin_client)
+        response = client.get('/api/v1/titles/')
+        assert 'Server-Timing' not in response, (
+            'Проверьте, что без DEBUG заголовок `Server-Timing` получают '
+            'только администраторы.'
+        )
+        response = admin_client.get('/api/v1/titles/')
+        timing = response.get('Server-Timing', '')
+        for metric in ('db;', 'app;', 'render;', 'total;'):
+            assert metric in timing, (
+                'Проверьте, что ответ содержит заголовок `Server-Timing` '
+                f'с метрикой `{metric[:-1]}`.'
+            )
+
+        response = admin_client.get('/api/v1/metrics/')
+        assert response.status_code == HTTPStatus.OK
+        report = response.json()
+        assert report['GET api:titles-list']['requests'] == 2, (
+            'Проверьте, что сводка метрик `/api/v1/metrics/` собирается '
+            'по имени представления.'
+        )
+        assert report['GET api:titles-list']['max_queries'] > 0
+
+    def test_02_metrics_admin_only(self, client, user_client):
+        assert client.get('/api/v1/metrics/').status_code == (
+            HTTPStatus.UNAUTHORIZED
+        )
+        assert user_client.get('/api/v1/metrics/').status_code == (
+            HTTPStatus.FORBIDDEN
+        )
+
+    def test_03_query_budget(self, client, admin_client, settings, caplog):
+        create_titles(admin_client)
+        settings.QUERY_BUDGETS = {'api:titles-list': 1}
+        with caplog.at_level(logging.WARNING, logger='api.middleware'):
+            client.get('/api/v1/titles/')
+        assert 'api:titles-list' in caplog.text, (
+            'Проверьте, что превышение бюджета запросов представления '
+            'записывается в лог предупреждением.'
+        )
@@ -0,0 +1,87 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from reviews.models import Comment, Review, Title, TitleGenre, User
+
+DATASET = {
+    'users': 6,
+    'categories': 2,
+    'genres': 3,
+    'titles': 4,
+    'reviews': 15,
+    'comments': 20,
+}
+
+
+def run_benchmark(**options):
+    stdout = StringIO()
+    call_command(
+        'benchmark', requests=40, warmup=5,
+        stdout=stdout, stderr=StringIO(), **options
+    )
+    return json.loads(stdout.getvalue())
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16Benchmark:
+
+    def test_01_generate_dataset(self):
+        run_benchmark(generate=True, **DATASET)
+        for model, count in (
+            (User, DATASET['users']),
+            (Title, DATASET['titles']),
+            (Review, DATASET['reviews']),
+            (Comment, DATASET['comments']),
+        ):
+            assert model.objects.count() == count, (
+                f'Проверьте, что `benchmark --generate` создает заданное '
+                f'количество строк `{model.__name__}`.'
+            )
+        assert TitleGenre.objects.exists(), (
+            'Проверьте, что сгенерированным произведениям назначаются жанры.'
+        )
+        assert not Title.objects.all().recount_ratings(commit=False), (
+            'Проверьте, что после генерации данных счетчики рейтинга '
+            'произведений пересчитаны.'
+        )
+
+    def test_02_report(self):
+        report = run_benchmark(generate=True, **DATASET)
+        endpoints = report['endpoints']
+        assert {'titles-list', 'reviews-list', 'comments-list'} <= set(
+            endpoints
+        ), (
+            'Проверьте, что бенчмарк замеряет списки произведений, '
+            'отзывов и комментариев.'
+        )
+        assert sum(item['count'] for item in endpoints.values()) == 40, (
+            'Проверьте, что в отчет попадают только замеряемые запросы, '
+            'без прогрева.'
+        )
+        for name, item in endpoints.items():
+            assert item['errors'] == 0, (
+                f'Проверьте, что запросы сценария `{name}` выполняются '
+                f'без ошибок.'
+            )
+            assert item['p50'] <= item['p90'] <= item['p99'] <= item['max'], (
+                'Проверьте расчет перцентилей задержки.'
+            )
+
+    def test_03_same_seed_same_requests(self):
+        first = run_benchmark(generate=True, **DATASET)
+        second = run_benchmark()
+        assert {
+            name: item['count'] for name, item in first['endpoints'].items()
+        } == {
+            name: item['count'] for name, item in second['endpoints'].items()
+        }, (
+            'Проверьте, что при одинаковом `--seed` бенчмарк воспроизводит '
+            'одну и ту же последовательность запросов.'
+        )
+
+    def test_04_too_many_reviews(self):
+        with pytest.raises(CommandError):
+            run_benchmark(generate=True, **{**DATASET, 'reviews': 100})
@@ -0,0 +1,112 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db.models import Avg, Count, Max, Min
+
+from reviews.models import Category, Comment, Genre, Review, Title, User
+
+DATASET = {
+    'users': 30,
+    'categories': 3,
+    'genres': 5,
+    'titles': 40,
+    'reviews': 300,
+    'comments': 200,
+    'now': '2024-01-01T00:00:00',
+}
+
+
+def generate(**options):
+    call_command(
+        'generate_data', batch_size=50, stdout=StringIO(),
+        **{**DATASET, **options}
+    )
+
+
+def snapshot():
+    return (
+        list(Title.objects.values_list(
+            'id', 'name', 'year', 'category_id', 'score_sum', 'review_count'
+        )),
+        list(Review.objects.order_by('id').values_list(
+            'id', 'title_id', 'author_id', 'score', 'text', 'pub_date'
+        )),
+        list(Comment.objects.order_by('id').values_list(
+            'id', 'review_id', 'author_id', 'text', 'pub_date'
+        )),
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17GenerateData:
+
+    def test_01_sizes_and_counters(self):
+        generate()
+        for model, name in (
+            (User, 'users'),
+            (Category, 'categories'),
+            (Genre, 'genres'),
+            (Title, 'titles'),
+            (Review, 'reviews'),
+            (Comment, 'comments'),
+        ):
+            assert model.objects.count() == DATASET[name], (
+                f'Проверьте, что `generate_data` создает заданное '
+                f'количество строк `{model.__name__}`.'
+            )
+        assert not Title.objects.all().recount_ratings(commit=False), (
+            'Проверьте, что `generate_data` пересчитывает счетчики '
+            'рейтинга произведений.'
+        )
+
+    def test_02_deterministic(self):
+        generate(seed=7)
+        first = snapshot()
+        for model in (User, Category, Genre, Title):
+            model.objects.all().delete()
+        generate(seed=7)
+        assert snapshot() == first, (
+            'Проверьте, что `generate_data` с одинаковыми `--seed` и '
+            '`--now` создает одинаковые строки.'
+        )
+        for model in (User, Category, Genre, Title):
+            model.objects.all().delete()
+        generate(seed=8)
+        assert snapshot() != first, (
+            'Проверьте, что `--seed` влияет на сгенерированные данные.'
+        )
+
+    def test_03_distributions(self):
+        generate()
+        counts = Title.objects.aggregate(
+            top=Max('review_count'), bottom=Min('review_count')
+        )
+        assert counts['top'] == DATASET['users'], (
+            'Проверьте, что популярность произведений распределена по '
+            'закону Ципфа, а отзывов на произведение не больше, '
+            'чем пользователей.'
+        )
+        assert counts['bottom'] < DATASET['reviews'] / DATASET['titles'], (
+            'Проверьте, что отзывы распределены по произведениям '
+            'неравномерно.'
+        )
+        scores = Review.objects.aggregate(
+            low=Min('score'), high=Max('score'), mean=Avg('score')
+        )
+        assert 1 <= scores['low'] and scores['high'] <= 10, (
+            'Проверьте, что оценки лежат в диапазоне от 1 до 10.'
+        )
+        assert 5 < scores['mean'] < 9, (
+            'Проверьте, что оценки смещены к высоким значениям.'
+        )
+        duplicates = Review.objects.values('title', 'author').annotate(
+            total=Count('id')
+        ).filter(total__gt=1)
+        assert not duplicates.exists()
+
+    def test_04_invalid_options(self):
+        with pytest.raises(CommandError):
+            generate(reviews=DATASET['titles'] * DATASET['users'] + 1)
+        with pytest.raises(CommandError):
+            generate(now='вчера')
@@ -0,0 +1,174 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import (SCORES, CategoryStats, Genre, GenreStats,
+                            Review, Title)
+from reviews.stats import rebuild_all_stats
+from tests.utils import create_reviews
+
+STATS_FIELDS = (
+    'pk', 'title_count', 'review_count', 'score_sum',
+    *(f'score_{score}' for score in SCORES),
+)
+
+
+def stored_stats():
+    return {
+        model.__name__: sorted(model.objects.values_list(*STATS_FIELDS))
+        for model in (GenreStats, CategoryStats)
+    }
+
+
+def check_stats(step):
+    stored = stored_stats()
+    rebuild_all_stats()
+    assert stored_stats() == stored, (
+        'Проверьте, что сводки жанров и категорий обновляются на разницу '
+        f'и совпадают с полным пересчетом: {step}.'
+    )
+
+
+def histogram(**counts):
+    return {str(score): counts.get(f's{score}', 0) for score in SCORES}
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18GroupStats:
+
+    def create_reviews(self, admin_client, admin, user_client, user,
+                       moderator_client, moderator):
+        return create_reviews(admin_client, {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client,
+        })
+
+    def test_01_stats_endpoint(self, client, admin_client, admin,
+                               user_client, user,
+                               moderator_client, moderator):
+        self.create_reviews(
+            admin_client, admin, user_client, user,
+            moderator_client, moderator
+        )
+        for url, expected in (
+            ('/api/v1/genres/horror/stats/', {
+                'title_count': 1, 'review_count': 3, 'mean_score': 5.0,
+                'histogram': histogram(s5=3),
+            }),
+            ('/api/v1/genres/drama/stats/', {
+                'title_count': 1, 'review_count': 0, 'mean_score': None,
+                'histogram': histogram(),
+            }),
+            ('/api/v1/categories/films/stats/', {
+                'title_count': 1, 'review_count': 3, 'mean_score': 5.0,
+                'histogram': histogram(s5=3),
+            }),
+        ):
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url)
+            assert response.status_code == HTTPStatus.OK, (
+                f'Проверьте, что GET-запрос к `{url}` доступен без токена.'
+            )
+            assert response.json() == expected, (
+                f'Проверьте, что GET-запрос к `{url}` возвращает количество '
+                'произведений и отзывов, среднюю оценку и гистограмму оценок.'
+            )
+            assert len(context) == 1, (
+                f'Проверьте, что GET-запрос к `{url}` читает готовую сводку '
+                'одним запросом.'
+            )
+        response = client.get('/api/v1/genres/unknown/stats/')
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_02_incremental_updates(self, admin_client, admin,
+                                    user_client, user,
+                                    moderator_client, moderator):
+        reviews, titles = self.create_reviews(
+            admin_client, admin, user_client, user,
+            moderator_client, moderator
+        )
+        check_stats('создание произведений и отзывов')
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        reviews_url = f'{title_url}reviews/'
+
+        user_client.patch(
+            f'{reviews_url}{reviews[1]["id"]}/', data={'score': 8}
+        )
+        check_stats('изменение оценки отзыва')
+
+        response = admin_client.patch(
+            title_url, data={'genre': ['drama'], 'category': 'books'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        check_stats('смена жанров и категории произведения')
+
+        title = Title.objects.get(pk=titles[0]['id'])
+        horror = Genre.objects.get(slug='horror')
+        title.genre.add(horror)
+        check_stats('добавление жанра через m2m')
+        title.genre.remove(horror, Genre.objects.get(slug='comedy'))
+        check_stats('удаление жанров через m2m')
+        Genre.objects.get(slug='comedy').title_set.add(title)
+        check_stats('добавление произведения в жанр')
+        title.genre.clear()
+        check_stats('очистка жанров произведения')
+        title.genre.add(horror)
+
+        admin_client.delete(f'{reviews_url}{reviews[0]["id"]}/')
+        check_stats('удаление отзыва')
+        moderator.delete()
+        check_stats('каскадное удаление отзывов пользователя')
+        Review.objects.create(
+            title=title, author=admin, text='text', score=2
+        )
+        check_stats('создание отзыва через ORM')
+        admin_client.delete(title_url)
+        check_stats('удаление произведения с отзывами')
+
+    def test_03_missing_stats_rebuilt(self, client, admin_client, admin,
+                                      user_client, user,
+                                      moderator_client, moderator):
+        self.create_reviews(
+            admin_client, admin, user_client, user,
+            moderator_client, moderator
+        )
+        GenreStats.objects.all().delete()
+        response = client.get('/api/v1/genres/comedy/stats/')
+        assert response.json()['review_count'] == 3, (
+            'Проверьте, что отсутствующая сводка жанра пересчитывается '
+            'при запросе.'
+        )
+        assert GenreStats.objects.filter(genre__slug='comedy').exists()
+        with CaptureQueriesContext(connection) as context:
+            client.get('/api/v1/genres/comedy/stats/')
+        assert all(
+            query['sql'].startswith('SELECT')
+            for query in context.captured_queries
+        ), 'Проверьте, что сводка с готовой строкой только читается.'
+
+    def test_04_failed_title_delete(self, admin_client, admin,
+                                    user_client, user,
+                                    moderator_client, moderator,
+                                    monkeypatch):
+        reviews, titles = self.create_reviews(
+            admin_client, admin, user_client, user,
+            moderator_client, moderator
+        )
+        title = Title.objects.get(pk=titles[0]['id'])
+
+        def fail(*args, **kwargs):
+            raise RuntimeError('сбой при удалении')
+
+        monkeypatch.setattr('reviews.signals.bump_versions', fail)
+        with pytest.raises(RuntimeError):
+            title.delete()
+        monkeypatch.undo()
+        assert Title.objects.filter(pk=title.pk).exists()
+
+        Review.objects.get(pk=reviews[0]['id']).delete()
+        check_stats(
+            'удаление отзыва после оборвавшегося удаления произведения'
+        )
@@ -0,0 +1,154 @@
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from reviews import trending as trends
+from reviews.models import Review, Title, TitleTrend, TrendEpoch
+from reviews.trending import (HALF_LIFE, decay_factor, rebuild_trends,
+                              renormalize_trends)
+from tests.utils import create_titles
+
+URL = '/api/v1/titles/trending/'
+
+
+def trending(client, **params):
+    response = client.get(URL, params)
+    assert response.status_code == HTTPStatus.OK, (
+        f'Проверьте, что GET-запрос к `{URL}` доступен без токена.'
+    )
+    return {
+        title['name']: title['trending_score']
+        for title in response.json()['results']
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+class Test19Trending:
+
+    def create_reviews(self, django_user_model, scores):
+        """scores: {название произведения: количество отзывов}."""
+        authors = [
+            django_user_model.objects.create_user(
+                username=f'author{index}', email=f'author{index}@yamdb.fake'
+            )
+            for index in range(max(scores.values()))
+        ]
+        reviews = {}
+        for name, count in scores.items():
+            title = Title.objects.get(name=name)
+            reviews[name] = [
+                Review.objects.create(
+                    title=title, author=author, text='text', score=5
+                )
+                for author in authors[:count]
+            ]
+        return reviews
+
+    def test_01_recent_activity_ranks_first(self, client, admin_client,
+                                            django_user_model):
+        create_titles(admin_client)
+        Title.objects.create(name='Без отзывов', year=2000)
+        reviews = self.create_reviews(
+            django_user_model, {'Терминатор': 1, 'Крепкий орешек': 3}
+        )
+        scores = trending(client)
+        assert list(scores) == ['Крепкий орешек', 'Терминатор'], (
+            f'Проверьте, что `{URL}` упорядочивает произведения по '
+            'активности отзывов и не показывает произведения без отзывов.'
+        )
+        assert scores['Крепкий орешек'] == pytest.approx(3, rel=1e-3)
+
+        old = timezone.now() - timedelta(seconds=HALF_LIFE * 3)
+        Review.objects.filter(
+            pk__in=[review.pk for review in reviews['Крепкий орешек']]
+        ).update(pub_date=old)
+        rebuild_trends()
+        scores = trending(client)
+        assert list(scores) == ['Терминатор', 'Крепкий орешек'], (
+            f'Проверьте, что в `{URL}` вклад отзыва затухает со временем.'
+        )
+        assert scores['Крепкий орешек'] == pytest.approx(3 / 8, rel=1e-3)
+
+        reviews['Терминатор'][0].delete()
+        assert list(trending(client)) == ['Крепкий орешек'], (
+            'Проверьте, что удаление отзыва уменьшает оценку тренда.'
+        )
+
+    def test_02_filters(self, client, admin_client, django_user_model):
+        create_titles(admin_client)
+        self.create_reviews(
+            django_user_model, {'Терминатор': 1, 'Крепкий орешек': 2}
+        )
+        assert list(trending(client, genre='horror')) == ['Терминатор'], (
+            f'Проверьте, что `{URL}` поддерживает фильтр `genre`.'
+        )
+        assert list(trending(client, category='books')) == [
+            'Крепкий орешек'
+        ], (
+            f'Проверьте, что `{URL}` поддерживает фильтр `category`.'
+        )
+
+    def test_03_renormalize_keeps_scores(self, client, admin_client,
+                                         django_user_model):
+        create_titles(admin_client)
+        self.create_reviews(
+            django_user_model, {'Терминатор': 1, 'Крепкий орешек': 2}
+        )
+        before = trending(client)
+        epoch = TrendEpoch.objects.get(pk=1).timestamp
+        call_command('renormalize_trending', stdout=StringIO())
+        assert TrendEpoch.objects.get(pk=1).timestamp > epoch, (
+            'Проверьте, что `renormalize_trending` сдвигает отметку отсчета.'
+        )
+        after = trending(client)
+        assert after == pytest.approx(before, rel=1e-3), (
+            'Проверьте, что нормализация не меняет оценки трендов.'
+        )
+
+        call_command('renormalize_trending', rebuild=True, stdout=StringIO())
+        assert trending(client) == pytest.approx(before, rel=1e-3), (
+            'Проверьте, что оценки, обновляемые на каждый отзыв, '
+            'совпадают с полным пересчетом.'
+        )
+
+    def test_04_epoch_change_during_write(self, admin_client,
+                                          django_user_model, monkeypatch):
+        create_titles(admin_client)
+        self.create_reviews(django_user_model, {'Терминатор': 1})
+        title = Title.objects.get(name='Терминатор')
+        read_epoch = trends.current_epoch
+        calls = []
+
+        def racing_epoch():
+            # Нормализация успевает между чтением отметки и UPDATE.
+            epoch = read_epoch()
+            if not calls:
+                calls.append(epoch)
+                renormalize_trends(now=epoch + HALF_LIFE)
+            return epoch
+
+        monkeypatch.setattr(trends, 'current_epoch', racing_epoch)
+        # Процесс еще не знает отметку и читает ее перед UPDATE.
+        monkeypatch.setattr(trends, '_known_epoch', None)
+        author = django_user_model.objects.create_user(
+            username='racer', email='racer@yamdb.fake'
+        )
+        Review.objects.create(title=title, author=author, text='t', score=5)
+        monkeypatch.undo()
+
+        now = calls[0] + HALF_LIFE
+        epoch = TrendEpoch.objects.get(pk=1).timestamp
+        incremental = TitleTrend.objects.get(title=title).score * decay_factor(
+            epoch, now
+        )
+        rebuild_trends(now=now)
+        assert incremental == pytest.approx(
+            TitleTrend.objects.get(title=title).score, rel=1e-6
+        ), (
+            'Проверьте, что вклад отзыва пересчитывается от новой отметки, '
+            'если нормализация прошла во время записи.'
+        )
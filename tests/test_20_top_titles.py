@@ -0,0 +1,188 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews import top
+from reviews.models import Category, Genre, Review, Title, TopTitle
+
+URL = '/api/v1/titles/top/'
+
+
+def stored_top():
+    return sorted(
+        (genre or 0, category or 0, title, round(rating, 9))
+        for genre, category, title, rating in TopTitle.objects.values_list(
+            'genre', 'category', 'title', 'rating'
+        )
+    )
+
+
+def check_top(step):
+    stored = stored_top()
+    top.rebuild_top()
+    assert stored_top() == stored, (
+        'Проверьте, что списки лучших произведений обновляются на месте '
+        f'и совпадают с полным пересчетом: {step}.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test20TopTitles:
+
+    @pytest.fixture(autouse=True)
+    def small_top(self, monkeypatch):
+        monkeypatch.setattr(top, 'TOP_SIZE', 2)
+
+    def create_titles(self, count):
+        films = Category.objects.create(name='Фильм', slug='films')
+        horror = Genre.objects.create(name='Ужасы', slug='horror')
+        titles = []
+        for index in range(count):
+            title = Title.objects.create(
+                name=f'Произведение {index}', year=2000, category=films
+            )
+            title.genre.add(horror)
+            titles.append(title)
+        return titles
+
+    def create_authors(self, django_user_model, count):
+        return [
+            django_user_model.objects.create_user(
+                username=f'author{index}', email=f'author{index}@yamdb.fake'
+            )
+            for index in range(count)
+        ]
+
+    def test_01_endpoint(self, client, django_user_model):
+        titles = self.create_titles(3)
+        authors = self.create_authors(django_user_model, 2)
+        for title, score in zip(titles, (6, 10, 8)):
+            for author in authors:
+                Review.objects.create(
+                    title=title, author=author, text='text', score=score
+                )
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(URL)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{URL}` доступен без токена.'
+        )
+        assert len(context) == 1, (
+            f'Проверьте, что `{URL}` отдает все списки одним запросом.'
+        )
+        data = response.json()
+        expected = [titles[1].name, titles[2].name]
+        for key, slug in (('genres', 'horror'), ('categories', 'films')):
+            assert [
+                title['name'] for title in data[key][slug]
+            ] == expected, (
+                f'Проверьте, что `{URL}` возвращает в `{key}` не больше '
+                'TOP_TITLES_SIZE произведений по убыванию взвешенного '
+                'рейтинга.'
+            )
+        assert set(data['genres']['horror'][0]) == {
+            'id', 'name', 'year', 'rating', 'weighted_rating'
+        }
+
+    def test_02_incremental_updates(self, admin_client, admin, user_client,
+                                    user, django_user_model):
+        titles = self.create_titles(4)
+        authors = self.create_authors(django_user_model, 2)
+        reviews = {}
+        for title, score in zip(titles, (5, 7, 9, 3)):
+            for author in authors:
+                reviews[title.pk, author.pk] = Review.objects.create(
+                    title=title, author=author, text='text', score=score
+                )
+        check_top('создание отзывов')
+
+        url = f'/api/v1/titles/{titles[0].pk}/reviews/'
+        response = user_client.post(url, data={'text': 't', 'score': 10})
+        assert response.status_code == HTTPStatus.CREATED
+        check_top('отзыв через API поднимает произведение в список')
+
+        review = Review.objects.get(pk=reviews[titles[2].pk, authors[0].pk].pk)
+        review.score = 1
+        review.save()
+        check_top('снижение оценки вытесняет произведение из списка')
+
+        reviews[titles[1].pk, authors[1].pk].delete()
+        check_top('удаление отзыва')
+
+        drama = Genre.objects.create(name='Драма', slug='drama')
+        titles[3].genre.add(drama)
+        check_top('добавление жанра')
+        titles[0].genre.remove(Genre.objects.get(slug='horror'))
+        check_top('удаление жанра')
+        drama.title_set.add(titles[2])
+        check_top('добавление произведения в жанр')
+        titles[3].genre.clear()
+        check_top('очистка жанров произведения')
+
+        response = admin_client.patch(
+            f'/api/v1/titles/{titles[1].pk}/',
+            data={'genre': ['drama'], 'category': 'films'},
+        )
+        assert response.status_code == HTTPStatus.OK
+        books = Category.objects.create(name='Книги', slug='books')
+        title = Title.objects.get(pk=titles[2].pk)
+        title.category = books
+        title.save()
+        check_top('смена жанров и категории')
+
+        Title.objects.get(pk=titles[0].pk).delete()
+        check_top('удаление произведения')
+        authors[0].delete()
+        check_top('каскадное удаление отзывов пользователя')
+
+    def test_03_group_rows_locked(self, django_user_model, monkeypatch):
+        titles = self.create_titles(1)
+        author = self.create_authors(django_user_model, 1)[0]
+        # SQLite не поддерживает SELECT ... FOR UPDATE: проверяем, какие
+        # строки запрашиваются под блокировку, без самого FOR UPDATE.
+        monkeypatch.setattr(
+            connection.features, 'has_select_for_update', True
+        )
+        monkeypatch.setattr(
+            connection.ops, 'for_update_sql', lambda *args, **kwargs: ''
+        )
+        with CaptureQueriesContext(connection) as context:
+            Review.objects.create(
+                title=titles[0], author=author, text='text', score=5
+            )
+        locked = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and ('FROM "reviews_genrestats"' in query['sql']
+                 or 'FROM "reviews_categorystats"' in query['sql'])
+        ]
+        assert len(locked) == 2, (
+            'Проверьте, что правка списков лучших блокирует строки сводок '
+            'жанров и категорий произведения.'
+        )
+
+    def test_04_rating_read_after_concurrent_review(self, django_user_model):
+        titles = self.create_titles(1)
+        authors = self.create_authors(django_user_model, 2)
+        Review.objects.create(
+            title=titles[0], author=authors[0], text='text', score=5
+        )
+        # Вьюсет загрузил отзыв с произведением, а тем временем другой
+        # запрос добавил отзыв к тому же произведению.
+        review = Review.objects.select_related('title').get()
+        Review.objects.create(
+            title=titles[0], author=authors[1], text='text', score=10
+        )
+        review.score = 8
+        review.save()
+
+        title = Title.objects.get(pk=titles[0].pk)
+        ratings = list(TopTitle.objects.values_list('rating', flat=True))
+        assert ratings == pytest.approx(
+            [title.weighted_rating] * len(ratings)
+        ) and ratings, (
+            'Проверьте, что рейтинг в списках лучших берется из базы после '
+            'обновления счетчиков, а не из загруженного ранее произведения.'
+        )
+        check_top('изменение отзыва после чужого отзыва')
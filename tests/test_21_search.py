@@ -0,0 +1,100 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Title
+from reviews.search import (SimpleSearchBackend, SQLiteSearchBackend,
+                            search_backend)
+
+URL = '/api/v1/titles/'
+
+
+def search(client, query, **params):
+    response = client.get(URL, {'search': query, **params})
+    assert response.status_code == HTTPStatus.OK, (
+        f'Проверьте, что GET-запрос к `{URL}` с параметром `search` '
+        'доступен без токена.'
+    )
+    return [title['name'] for title in response.json()['results']]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test21Search:
+
+    def create_titles(self):
+        return [
+            Title.objects.create(name=name, year=2000, description=text)
+            for name, text in (
+                ('Ёжик в тумане', 'Мультфильм о ежике и лошади'),
+                ('Туманность Андромеды', 'Роман о далеком будущем'),
+                ('Солярис', 'Океан, туман и станция на орбите'),
+                ('Сталкер', None),
+            )
+        ]
+
+    def test_01_ranked_prefix_search(self, client):
+        assert isinstance(search_backend(), SQLiteSearchBackend), (
+            'Проверьте, что для SQLite по умолчанию используется FTS5.'
+        )
+        self.create_titles()
+        found = search(client, 'туман')
+        assert len(found) == 3 and found[2] == 'Солярис' and set(
+            found[:2]
+        ) == {'Ёжик в тумане', 'Туманность Андромеды'}, (
+            'Проверьте, что поиск находит слова по префиксу в названии '
+            'и описании, а совпадения в названии стоят выше.'
+        )
+        assert search(client, 'ЁЖИК') == ['Ёжик в тумане'], (
+            'Проверьте, что поиск не зависит от регистра кириллицы.'
+        )
+        assert search(client, 'ежик туман') == ['Ёжик в тумане'], (
+            'Проверьте, что поиск находит только произведения со всеми '
+            'словами запроса.'
+        )
+        assert search(client, 'туман', ordering='name') == [
+            'Ёжик в тумане', 'Солярис', 'Туманность Андромеды'
+        ], (
+            'Проверьте, что параметр `ordering` заменяет сортировку '
+            'по релевантности.'
+        )
+        assert search(client, '"*') == []
+        assert search(client, 'сталк') == ['Сталкер']
+
+    def test_02_index_follows_changes(self, client, admin_client):
+        titles = self.create_titles()
+        response = admin_client.patch(
+            f'{URL}{titles[3].pk}/',
+            data={'name': 'Пикник на обочине', 'description': 'Зона'},
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert search(client, 'сталкер') == [], (
+            'Проверьте, что изменение названия обновляет поисковый индекс.'
+        )
+        assert search(client, 'пикник') == ['Пикник на обочине']
+
+        titles[0].delete()
+        assert search(client, 'туман') == [
+            'Туманность Андромеды', 'Солярис'
+        ], (
+            'Проверьте, что удаленное произведение пропадает из поиска.'
+        )
+
+        Title.objects.filter(pk=titles[2].pk).update(name='Нет в индексе')
+        call_command('rebuild_search_index', stdout=StringIO())
+        assert search(client, 'индекс') == ['Нет в индексе'], (
+            'Проверьте, что `rebuild_search_index` пересчитывает индекс.'
+        )
+
+    def test_03_simple_backend(self):
+        self.create_titles()
+        backend = SimpleSearchBackend()
+        found = backend.search(Title.objects.all(), 'ТУМАН')
+        assert list(found.values_list('name', flat=True)) == [
+            'Ёжик в тумане', 'Туманность Андромеды', 'Солярис'
+        ], (
+            'Проверьте, что поиск без индекса тоже ищет слова по префиксу '
+            'без учета регистра.'
+        )
+        assert not backend.search(Title.objects.all(), 'уман').exists()
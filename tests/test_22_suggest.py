@@ -0,0 +1,176 @@
+import os
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews import suggest
+from reviews.models import Review, Title
+from reviews.suggest import suggest_index
+
+URL = '/api/v1/titles/suggest/'
+
+
+def suggestions(client, query):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(URL, {'q': query})
+    assert response.status_code == HTTPStatus.OK, (
+        f'Проверьте, что GET-запрос к `{URL}` доступен без токена.'
+    )
+    assert len(context) == 0, (
+        f'Проверьте, что `{URL}` отвечает из индекса в памяти, '
+        'не обращаясь к базе данных.'
+    )
+    return [title['name'] for title in response.json()]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test22Suggest:
+
+    @pytest.fixture(autouse=True)
+    def fresh_index(self, monkeypatch):
+        # В тестах фоновый поток не запускается: индекс строится явно.
+        monkeypatch.setattr(suggest_index, 'background', False)
+        suggest_index.refresh()
+
+    def create_titles(self, django_user_model):
+        authors = [
+            django_user_model.objects.create_user(
+                username=f'author{index}', email=f'author{index}@yamdb.fake'
+            )
+            for index in range(3)
+        ]
+        titles = {}
+        for name, count in (
+            ('Крепкий орешек', 1),
+            ('Крестный отец', 3),
+            ('Ёжик в тумане', 2),
+            ('Кредо убийцы', 0),
+        ):
+            title = Title.objects.create(name=name, year=2000)
+            for author in authors[:count]:
+                Review.objects.create(
+                    title=title, author=author, text='text', score=5
+                )
+            titles[name] = title
+        return titles, authors
+
+    def test_01_suggest(self, client, django_user_model):
+        self.create_titles(django_user_model)
+        assert suggestions(client, 'КРЕ') == [
+            'Крестный отец', 'Крепкий орешек', 'Кредо убийцы'
+        ], (
+            f'Проверьте, что `{URL}` ищет по началу названия без учета '
+            'регистра и упорядочивает подсказки по количеству отзывов.'
+        )
+        assert suggestions(client, 'ежик') == ['Ёжик в тумане'], (
+            'Проверьте, что «ё» и «е» в подсказках не различаются.'
+        )
+        assert suggestions(client, 'оре') == ['Крепкий орешек'], (
+            'Проверьте, что подсказки находят начало любого слова названия.'
+        )
+        assert suggestions(client, 'крепкий  ОР') == ['Крепкий орешек']
+        assert suggestions(client, 'отец к') == []
+        assert suggestions(client, '  ') == []
+
+    def test_02_incremental_updates(self, client, admin_client,
+                                    django_user_model):
+        titles, authors = self.create_titles(django_user_model)
+
+        Title.objects.create(name='Кречет', year=2000)
+        assert suggestions(client, 'креч') == ['Кречет'], (
+            'Проверьте, что новое произведение сразу попадает в подсказки.'
+        )
+        response = admin_client.patch(
+            f'/api/v1/titles/{titles["Кредо убийцы"].pk}/',
+            data={'name': 'Убийца'},
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert suggestions(client, 'кред') == []
+        assert suggestions(client, 'убий') == ['Убийца'], (
+            'Проверьте, что смена названия обновляет подсказки.'
+        )
+
+        for author in authors[1:]:
+            Review.objects.create(
+                title=titles['Крепкий орешек'], author=author,
+                text='text', score=5,
+            )
+        assert suggestions(client, 'кре')[0] == 'Крепкий орешек', (
+            'Проверьте, что новые отзывы поднимают произведение в подсказках.'
+        )
+        Review.objects.filter(title=titles['Крепкий орешек']).first().delete()
+        Title.objects.get(name='Крестный отец').delete()
+        assert suggestions(client, 'кре') == [
+            'Крепкий орешек', 'Кречет'
+        ], (
+            'Проверьте, что удаление отзывов и произведений обновляет '
+            'подсказки.'
+        )
+
+    def test_03_dense_prefix(self, django_user_model, monkeypatch):
+        self.create_titles(django_user_model)
+        expected = suggest_index.suggest('к', limit=2)
+        monkeypatch.setattr(suggest, 'SCAN_LIMIT', 0)
+        assert suggest_index.suggest('к', limit=2) == expected, (
+            'Проверьте, что обход по популярности дает те же подсказки, '
+            'что и просмотр диапазона ключей.'
+        )
+        assert [name for _, name, _ in expected] == [
+            'Крестный отец', 'Крепкий орешек'
+        ]
+
+    def test_04_refreshed_in_background(self, client, django_user_model,
+                                        monkeypatch):
+        titles, _ = self.create_titles(django_user_model)
+        monkeypatch.setattr(suggest_index, 'ttl', 0)
+        Title.objects.filter(pk=titles['Кредо убийцы'].pk).update(
+            name='Кредит доверия'
+        )
+        assert suggestions(client, 'кред') == ['Кредо убийцы'], (
+            'Проверьте, что запрос подсказок не перечитывает индекс '
+            'из базы данных.'
+        )
+        suggest_index.refresh()
+        assert suggestions(client, 'кред') == ['Кредит доверия'], (
+            'Проверьте, что обновление индекса подхватывает изменения '
+            'в обход сигналов.'
+        )
+
+    def test_05_started_in_each_process(self, monkeypatch):
+        started = []
+        monkeypatch.setattr(suggest_index, 'background', True)
+        monkeypatch.setattr(
+            suggest_index, '_refresh_forever',
+            lambda: started.append(os.getpid())
+        )
+        # Так индекс выглядит в процессе, созданном fork: поток
+        # родителя в нем не работает.
+        suggest_index._after_fork()
+        suggest_index.suggest('кре')
+        suggest_index._refresher.join()
+        suggest_index.suggest('кре')
+        assert started == [os.getpid()], (
+            'Проверьте, что фоновый поток индекса подсказок запускается '
+            'при первом запросе в каждом процессе и только один раз.'
+        )
+
+    def test_06_unpopular_dense_prefix(self, django_user_model,
+                                       monkeypatch):
+        self.create_titles(django_user_model)
+        popular_count = len(suggest_index._titles)
+        for index in range(6):
+            title = Title.objects.create(name=f'Зебра {index}', year=2000)
+            suggest_index.set_title(title.pk, title.name)
+        expected = suggest_index.suggest('зеб', limit=2)
+        # Обход по популярности доходит только до произведений из
+        # фикстуры, ни одно из которых не подходит под префикс.
+        monkeypatch.setattr(suggest, 'SCAN_LIMIT', 0)
+        monkeypatch.setattr(suggest, 'POPULAR_SCAN_LIMIT', popular_count)
+        assert suggest_index.suggest('зеб', limit=2) == expected, (
+            'Проверьте, что при непопулярных совпадениях обход по '
+            'популярности ограничен, а подсказки берутся из диапазона '
+            'ключей.'
+        )
+        assert [name for _, name, _ in expected] == ['Зебра 0', 'Зебра 1']